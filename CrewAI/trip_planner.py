@@ -3,6 +3,7 @@ from crewai import Agent, Task, Crew
 from crewai.tools import tool
 from langchain_openai import ChatOpenAI
 import os
+import time
 from dotenv import load_dotenv
 
 # Make sure you set your API key in the environment before running:
@@ -110,13 +111,99 @@ quality_task = Task(
     agent=quality_control_expert
 )
 
+# Task graph: each task lists the tasks it depends on and gets their outputs as context.
+# Only the city choice is a real prerequisite, so the itinerary and the budget run side by side.
+tasks = {
+    "city": city_task,
+    "tour": tour_task,
+    "travel": travel_task,
+    "quality": quality_task,
+    "manager": manager_task,
+}
+dependencies = {
+    "city": [],
+    "tour": ["city"],
+    "travel": ["city"],
+    "quality": ["tour", "travel"],
+    "manager": ["tour", "travel", "quality"],
+}
+
+
+def dependency_levels(dependencies):
+    """Group task names into levels: every task comes after all the tasks it depends on."""
+    levels, done = [], set()
+    while len(done) < len(dependencies):
+        level = [name for name, deps in dependencies.items() if name not in done and set(deps) <= done]
+        if not level:
+            raise ValueError(f"Task dependencies contain a cycle: {sorted(set(dependencies) - done)}")
+        levels.append(level)
+        done.update(level)
+    return levels
+
+
+levels = dependency_levels(dependencies)
+ordered_names = [name for level in levels for name in level]
+completed_at = {}  # task name -> perf_counter() when its callback fired
+
+
+def record_completion(name):
+    def callback(output):
+        completed_at[name] = time.perf_counter()
+    return callback
+
+
+for level in levels:
+    for name in level:
+        task = tasks[name]
+        task.context = [tasks[dep] for dep in dependencies[name]]
+        # Tasks sharing a level run concurrently. CrewAI starts async tasks in the background and
+        # makes the next synchronous task wait for them, so each level finishes before the next begins.
+        task.async_execution = len(level) > 1 and name != ordered_names[-1]  # the final task must be sync
+        task.callback = record_completion(name)
+
+
+def timing_report(started_at):
+    """Per-task durations, the critical path through the graph and the sequential baseline."""
+    durations = {}
+    for name in ordered_names:
+        ready_at = max((completed_at[dep] for dep in dependencies[name]), default=started_at)
+        durations[name] = completed_at[name] - ready_at
+
+    # Longest path through the graph, weighted by task duration
+    path_length, previous = {}, {}
+    for name in ordered_names:
+        best = max(dependencies[name], key=lambda dep: path_length[dep], default=None)
+        path_length[name] = durations[name] + (path_length[best] if best else 0.0)
+        previous[name] = best
+    node = max(path_length, key=path_length.get)
+    critical_path = []
+    while node:
+        critical_path.append(node)
+        node = previous[node]
+
+    return {
+        "durations_s": {name: round(seconds, 2) for name, seconds in durations.items()},
+        "critical_path": list(reversed(critical_path)),
+        "critical_path_s": round(max(path_length.values()), 2),
+        "sequential_s": round(sum(durations.values()), 2),
+        "wall_clock_s": round(max(completed_at.values()) - started_at, 2),
+    }
+
+
 # Crew
 crew = Crew(
     agents=[manager, travel_agent, city_selection_expert, local_tour_guide, quality_control_expert],
-    tasks=[manager_task, travel_task, city_task, tour_task, quality_task],
+    tasks=[tasks[name] for name in ordered_names],
     verbose=True
 )
 
 if __name__ == "__main__":
+    started_at = time.perf_counter()
     result = crew.kickoff()
     print(result)
+
+    report = timing_report(started_at)
+    print("\nTask durations (s):", report["durations_s"])
+    print(f"Critical path: {' -> '.join(report['critical_path'])} = {report['critical_path_s']}s")
+    print(f"Sequential baseline (sum of tasks): {report['sequential_s']}s")
+    print(f"Wall clock: {report['wall_clock_s']}s")
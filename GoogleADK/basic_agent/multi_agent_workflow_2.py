@@ -1,7 +1,13 @@
 import os
+import sys
+import json
+import math
+import time
+import argparse
 import asyncio
 import httpx
-from typing import List
+from httpx_sse import aconnect_sse
+from typing import AsyncIterator, Callable, Iterable, List, Optional, TextIO
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,24 +25,105 @@ HEADERS = {
 }
 
 
-async def call_openai(messages: List[dict], model: str = MODEL, max_tokens: int = 512) -> str:
-    """Async call to OpenAI Chat Completions; returns assistant text."""
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        payload = {
-            "model": model,
-            "messages": messages,
-            "max_tokens": max_tokens,
-            "temperature": 0.7,
-        }
-        resp = await client.post(API_URL, json=payload, headers=HEADERS)
-        resp.raise_for_status()
-        j = resp.json()
-        # defensive: pick first choice
-        return j["choices"][0]["message"]["content"].strip()
+# ---------------- Shared HTTP client ----------------
+# One pooled client is shared by every agent so the pipeline hops reuse
+# keep-alive connections instead of paying a new TCP + TLS handshake each time.
+HTTP2 = os.getenv("OPENAI_HTTP2", "1") == "1"  # needs the `h2` package
+MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_REQUEST_TIMEOUT", "30"))
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared AsyncClient for the running event loop, creating it on first use.
+
+    Pooled connections belong to the loop that opened them, so a new loop
+    (e.g. one asyncio.run(run_pipeline(topic)) per topic) gets a new client.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            http2=HTTP2,
+            headers=HEADERS,
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def close_client() -> None:
+    """Close the shared client and its pooled connections."""
+    global _client, _client_loop
+    # A client from an earlier (already closed) loop cannot be closed from this one; just drop it
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+async def stream_openai(messages: List[dict], model: str = MODEL, max_tokens: int = 512) -> AsyncIterator[str]:
+    """Async streaming call to OpenAI Chat Completions; yields text deltas as they arrive (SSE)."""
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": 0.7,
+        "stream": True,
+    }
+    async with aconnect_sse(get_client(), "POST", API_URL, json=payload) as event_source:
+        event_source.response.raise_for_status()
+        async for sse in event_source.aiter_sse():
+            if sse.data == "[DONE]":
+                break
+            choices = json.loads(sse.data).get("choices") or []
+            delta = choices[0].get("delta", {}).get("content") if choices else None
+            if delta:
+                yield delta
+
+
+async def call_openai(
+    messages: List[dict],
+    model: str = MODEL,
+    max_tokens: int = 512,
+    on_token: Optional[Callable[[str], None]] = None,
+) -> str:
+    """Async call to OpenAI Chat Completions; returns assistant text.
+
+    If `on_token` is given the response is streamed and every delta is passed
+    to it as soon as it arrives.
+    """
+    if on_token is not None:
+        parts = []
+        async for delta in stream_openai(messages, model=model, max_tokens=max_tokens):
+            on_token(delta)
+            parts.append(delta)
+        return "".join(parts).strip()
+
+    payload = {
+        "model": model,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": 0.7,
+    }
+    resp = await get_client().post(API_URL, json=payload)
+    resp.raise_for_status()
+    j = resp.json()
+    # defensive: pick first choice
+    return j["choices"][0]["message"]["content"].strip()
 
 
 # ---------------- Agent implementations ----------------
-async def research_agent(topic: str) -> str:
+async def research_agent(topic: str, on_token: Optional[Callable[[str], None]] = None) -> str:
     prompt = (
         "You are a concise research assistant. For the topic below, list 4 short factual "
         "bullet points (one line each). Use only verifiable high-level facts or widely-known statements.\n\n"
@@ -46,10 +133,10 @@ async def research_agent(topic: str) -> str:
         {"role": "system", "content": "You are a helpful research assistant."},
         {"role": "user", "content": prompt},
     ]
-    return await call_openai(messages, max_tokens=300)
+    return await call_openai(messages, max_tokens=300, on_token=on_token)
 
 
-async def writer_agent(bullets_text: str) -> str:
+async def writer_agent(bullets_text: str, on_token: Optional[Callable[[str], None]] = None) -> str:
     prompt = (
         "You are a clear, engaging writer. Given the research bullet points below, "
         "write a single informative paragraph (3-5 sentences) suitable for a general audience. "
@@ -60,10 +147,10 @@ async def writer_agent(bullets_text: str) -> str:
         {"role": "system", "content": "You are a clear, engaging writer."},
         {"role": "user", "content": prompt},
     ]
-    return await call_openai(messages, max_tokens=350)
+    return await call_openai(messages, max_tokens=350, on_token=on_token)
 
 
-async def critic_agent(paragraph: str) -> str:
+async def critic_agent(paragraph: str, on_token: Optional[Callable[[str], None]] = None) -> str:
     prompt = (
         "You are a constructive critic and editor. Improve the paragraph below for clarity, "
         "conciseness, and accuracy. If any claim seems speculative (not supported by the bullets), "
@@ -74,46 +161,196 @@ async def critic_agent(paragraph: str) -> str:
         {"role": "system", "content": "You are a critical editor who improves text while preserving facts."},
         {"role": "user", "content": prompt},
     ]
-    return await call_openai(messages, max_tokens=300)
+    return await call_openai(messages, max_tokens=300, on_token=on_token)
 
 
 # ------------- Orchestration (sequential, streaming prints) -------------
-async def run_pipeline(topic: str):
-    print("\n=== Starting multi-agent pipeline ===\n")
-    print(f"[INPUT TOPIC] {topic}\n")
+async def run_pipeline(
+    topic: str,
+    verbose: bool = True,
+    stream: bool = False,
+    on_token: Optional[Callable[[str, str], None]] = None,
+):
+    """Run research -> writer -> critic for one topic.
+
+    With `stream=True` every stage streams its tokens: they are printed (when
+    verbose) and forwarded to `on_token(stage, token)` as they arrive, so the
+    first output of the pipeline appears as soon as the research stage emits
+    its first token. Each stage still needs the complete output of the
+    previous one before it can start. Per-stage time-to-first-token and total
+    generation time are returned under "timings".
+    """
+    log = print if verbose else (lambda *args, **kwargs: None)
+    timings = {}
+    pipeline_start = time.perf_counter()
+
+    async def run_stage(stage: str, agent, arg: str) -> str:
+        start = time.perf_counter()
+        first_token_at = None
+
+        def handle_token(token: str):
+            nonlocal first_token_at
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                timings.setdefault("pipeline_ttft_s", round(first_token_at - pipeline_start, 3))
+            if verbose:
+                print(token, end="", flush=True)
+            if on_token is not None:
+                on_token(stage, token)
+
+        out = await agent(arg, on_token=handle_token if stream else None)
+        end = time.perf_counter()
+        # Without streaming the first token arrives together with the last one
+        timings[stage] = {
+            "ttft_s": round((first_token_at or end) - start, 3),
+            "total_s": round(end - start, 3),
+        }
+        if stream:
+            log("\n")
+        else:
+            log(out.strip(), "\n")
+        return out
+
+    log("\n=== Starting multi-agent pipeline ===\n")
+    log(f"[INPUT TOPIC] {topic}\n")
 
     # Research
-    print("-> ResearchAgent: gathering bullet points...")
-    research_out = await research_agent(topic)
-    print("\n[ResearchAgent output]\n")
-    print(research_out.strip(), "\n")
+    log("-> ResearchAgent: gathering bullet points...")
+    log("\n[ResearchAgent output]\n")
+    research_out = await run_stage("research", research_agent, topic)
 
     # Writer (consume research output)
-    print("-> WriterAgent: writing paragraph from bullets...")
-    writer_out = await writer_agent(research_out)
-    print("\n[WriterAgent output]\n")
-    print(writer_out.strip(), "\n")
+    log("-> WriterAgent: writing paragraph from bullets...")
+    log("\n[WriterAgent output]\n")
+    writer_out = await run_stage("writer", writer_agent, research_out)
 
     # Critic
-    print("-> CriticAgent: improving the paragraph...")
-    critic_out = await critic_agent(writer_out)
-    print("\n[CriticAgent output]\n")
-    print(critic_out.strip(), "\n")
+    log("-> CriticAgent: improving the paragraph...")
+    log("\n[CriticAgent output]\n")
+    critic_out = await run_stage("critic", critic_agent, writer_out)
+
+    timings.setdefault("pipeline_ttft_s", timings["research"]["ttft_s"])
+    timings["pipeline_total_s"] = round(time.perf_counter() - pipeline_start, 3)
 
-    print("=== Pipeline finished ===\n")
+    log("=== Pipeline finished ===\n")
+    if stream:
+        log(f"[Timings] {json.dumps(timings)}\n")
     return {
         "research": research_out,
         "writer": writer_out,
         "critic": critic_out,
+        "timings": timings,
     }
 
 
-if __name__ == "__main__":
-    while True:
-        try:
-            topic = input("Enter a topic for the multi-agent pipeline (or 'exit' to quit): ").strip()
-            if topic.lower() == 'exit':
+# ------------- Batch mode (concurrent, JSONL output) -------------
+def _percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(values)) - 1)
+    return values[rank]
+
+
+async def run_batch(topics: Iterable[str], concurrency: int = 16, out: TextIO = sys.stdout) -> dict:
+    """Run many pipelines concurrently and stream one JSON line per topic as it finishes.
+
+    At most `concurrency` pipelines are in flight at once. A failing topic is
+    reported with an "error" field and does not stop the rest of the batch.
+    Returns aggregate latency stats for the whole batch.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index: int, topic: str) -> dict:
+        async with semaphore:
+            start = time.perf_counter()
+            result, error = None, None
+            try:
+                result = await run_pipeline(topic, verbose=False)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            return {
+                "index": index,
+                "topic": topic,
+                "latency_s": round(time.perf_counter() - start, 3),
+                "result": result,
+                "error": error,
+            }
+
+    batch_start = time.perf_counter()
+    tasks = [asyncio.create_task(run_one(i, t)) for i, t in enumerate(topics)]
+    latencies, failed = [], 0
+    for finished in asyncio.as_completed(tasks):
+        record = await finished
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        latencies.append(record["latency_s"])
+        if record["error"]:
+            failed += 1
+
+    wall = time.perf_counter() - batch_start
+    latencies.sort()
+    return {
+        "topics": len(latencies),
+        "failed": failed,
+        "wall_s": round(wall, 3),
+        "topics_per_s": round(len(latencies) / wall, 3) if wall else 0.0,
+        "latency_p50_s": _percentile(latencies, 50),
+        "latency_p95_s": _percentile(latencies, 95),
+        "latency_max_s": latencies[-1] if latencies else 0.0,
+    }
+
+
+def read_topics(path: str) -> List[str]:
+    """Read one topic per line from a file, or from stdin when path is '-'."""
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip()]
+
+
+async def main_batch(path: str, concurrency: int):
+    try:
+        summary = await run_batch(read_topics(path), concurrency=concurrency)
+    finally:
+        await close_client()
+    # Summary goes to stderr so stdout stays pure JSONL
+    print(json.dumps(summary), file=sys.stderr)
+
+
+async def main(stream: bool = False):
+    # A single event loop for the whole session, so every topic reuses the same
+    # pooled connections (a new loop would get a new client)
+    try:
+        while True:
+            try:
+                topic = (await asyncio.to_thread(
+                    input, "Enter a topic for the multi-agent pipeline (or 'exit' to quit): "
+                )).strip()
+                if topic.lower() == 'exit':
+                    break
+                await run_pipeline(topic, stream=stream)
+            except (EOFError, KeyboardInterrupt):
                 break
-            asyncio.run(run_pipeline(topic))
-        except Exception as e:
-            print(f"Error: {e}\nPlease try again.")
\ No newline at end of file
+            except Exception as e:
+                print(f"Error: {e}\nPlease try again.")
+    finally:
+        await close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Research -> writer -> critic pipeline")
+    parser.add_argument("--batch", metavar="PATH",
+                        help="file with one topic per line ('-' for stdin); results are written as JSONL")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="max pipelines in flight in batch mode")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream tokens of every stage as they arrive (interactive mode)")
+    args = parser.parse_args()
+
+    if args.batch:
+        asyncio.run(main_batch(args.batch, args.concurrency))
+    else:
+        asyncio.run(main(stream=args.stream))
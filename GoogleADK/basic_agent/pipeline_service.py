@@ -0,0 +1,202 @@
+# pipeline_service.py
+# Long-running HTTP service around the research -> writer -> critic pipeline.
+#
+# Run from this directory (one process, one persistent event loop):
+#   python pipeline_service.py
+#   # or: uvicorn pipeline_service:app --loop uvloop --host 0.0.0.0 --port 8000
+#   #     (plain uvicorn has no drain phase: it stops accepting connections at once)
+#
+#   POST /pipeline  {"topic": "..."}  -> {"research": ..., "writer": ..., "critic": ..., "timings": ...}
+#   GET  /healthz                     -> load counters (503 while draining)
+import os
+import json
+import asyncio
+import uvicorn
+from multi_agent_workflow_2 import run_pipeline, close_client
+
+HOST = os.getenv("PIPELINE_HOST", "0.0.0.0")
+PORT = int(os.getenv("PIPELINE_PORT", "8000"))
+MAX_CONCURRENT = int(os.getenv("PIPELINE_MAX_CONCURRENT", "32"))  # pipelines running at once
+MAX_QUEUED = int(os.getenv("PIPELINE_MAX_QUEUED", "128"))  # admitted requests waiting for a slot
+DRAIN_GRACE = float(os.getenv("PIPELINE_DRAIN_GRACE", "5"))  # seconds /healthz reports 503 before the listener closes
+DRAIN_TIMEOUT = float(os.getenv("PIPELINE_DRAIN_TIMEOUT", "60"))  # then, max wait for in-flight requests
+
+
+class PipelineService:
+    """Admission control around run_pipeline.
+
+    At most `max_concurrent` pipelines run at once and at most `max_queued`
+    more may wait for a slot; anything beyond that is rejected with 503 so
+    the load balancer can retry elsewhere. While `draining` (set by
+    DrainingServer when a shutdown signal arrives) new requests are
+    rejected and /healthz fails.
+    """
+
+    def __init__(self, max_concurrent: int = MAX_CONCURRENT, max_queued: int = MAX_QUEUED):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.admitted = 0  # running + queued
+        self.running = 0
+        self.rejected = 0
+        self.draining = False
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self.admitted - self.running,
+            "rejected": self.rejected,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+            "draining": self.draining,
+        }
+
+    def try_admit(self) -> bool:
+        if self.draining or self.admitted >= self.max_concurrent + self.max_queued:
+            self.rejected += 1
+            return False
+        self.admitted += 1
+        return True
+
+    async def run(self, topic: str) -> dict:
+        """Run one admitted pipeline; must be preceded by a successful try_admit()."""
+        try:
+            async with self.semaphore:
+                self.running += 1
+                try:
+                    return await run_pipeline(topic, verbose=False)
+                finally:
+                    self.running -= 1
+        finally:
+            self.admitted -= 1
+
+
+service = PipelineService()
+
+
+# ---------------- Minimal ASGI app (no web framework needed) ----------------
+async def _send_json(send, status: int, body: dict, headers=()):
+    payload = json.dumps(body).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(payload)).encode()),
+            *headers,
+        ],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            # uvicorn has already waited for (or cancelled) the in-flight requests at this point
+            await close_client()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"]
+
+    if path == "/healthz" and method == "GET":
+        await _send_json(send, 503 if service.draining else 200, service.stats())
+        return
+
+    if path != "/pipeline":
+        await _send_json(send, 404, {"error": "not found"})
+        return
+    if method != "POST":
+        await _send_json(send, 405, {"error": "method not allowed"}, [(b"allow", b"POST")])
+        return
+
+    try:
+        topic = str(json.loads(await _read_body(receive) or b"{}").get("topic", "")).strip()
+    except (ValueError, AttributeError):
+        await _send_json(send, 400, {"error": "body must be a JSON object"})
+        return
+    if not topic:
+        await _send_json(send, 400, {"error": "missing 'topic'"})
+        return
+
+    if not service.try_admit():
+        error = "server draining" if service.draining else "server busy"
+        await _send_json(send, 503, {"error": error, **service.stats()}, [(b"retry-after", b"1")])
+        return
+
+    try:
+        result = await service.run(topic)
+    except Exception as e:
+        await _send_json(send, 502, {"error": f"{type(e).__name__}: {e}"})
+        return
+    await _send_json(send, 200, result)
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server with a drain phase before shutdown.
+
+    uvicorn closes its listener as soon as it gets SIGTERM/SIGINT. Here the
+    first signal only marks the service as draining: for DRAIN_GRACE seconds
+    /healthz returns 503 and new requests are rejected, so the load balancer
+    stops routing here. Then the normal uvicorn shutdown runs, waiting up to
+    timeout_graceful_shutdown for in-flight requests. A second signal skips
+    the grace period.
+    """
+
+    _loop = None
+    _drain_timer = None
+
+    async def serve(self, sockets=None):
+        self._loop = asyncio.get_running_loop()
+        await super().serve(sockets)
+
+    def _start_drain_timer(self, sig, frame):
+        if not self.should_exit:  # a second signal already started the shutdown
+            self._drain_timer = self._loop.call_later(DRAIN_GRACE, super().handle_exit, sig, frame)
+
+    def handle_exit(self, sig, frame):
+        if service.draining or self._loop is None:
+            # Otherwise the timer would fire later and uvicorn would take it as a repeated
+            # signal, forcing the exit without waiting for in-flight requests
+            if self._drain_timer is not None:
+                self._drain_timer.cancel()
+            super().handle_exit(sig, frame)
+            return
+        service.draining = True
+        print(f"Draining: rejecting new requests for {DRAIN_GRACE}s, then shutting down")
+        # Signal handlers may run outside the loop's callbacks; hand the timer to the loop thread-safely
+        self._loop.call_soon_threadsafe(self._start_drain_timer, sig, frame)
+
+if __name__ == "__main__":
+    config = uvicorn.Config(
+        app,
+        host=HOST,
+        port=PORT,
+        loop="uvloop",
+        lifespan="on",
+        timeout_graceful_shutdown=int(DRAIN_TIMEOUT),
+    )
+    DrainingServer(config).run()
@@ -3,8 +3,13 @@ from langgraph.graph import StateGraph, START, END
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv
 from langchain.schema import HumanMessage, AIMessage
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[3]))
+from common.llm_cache import enable_llm_cache
 
 load_dotenv()
+llm_cache = enable_llm_cache()
 
 class AgentState(TypedDict):
     message: List[Union[HumanMessage, AIMessage]]
@@ -10,8 +10,13 @@ from langgraph.prebuilt import ToolNode
 import tempfile
 from PIL import Image
 import os
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[3]))
+from common.llm_cache import enable_llm_cache
 
 load_dotenv()
+llm_cache = enable_llm_cache()
 
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
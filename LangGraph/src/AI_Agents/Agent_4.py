@@ -9,8 +9,13 @@ from langchain_core.tools import tool
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode
 import os
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[3]))
+from common.llm_cache import enable_llm_cache
 
 load_dotenv()
+llm_cache = enable_llm_cache()
 
 # ----- State definition -----
 class AgentState(TypedDict):
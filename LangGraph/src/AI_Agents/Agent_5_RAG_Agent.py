@@ -1,105 +1,106 @@
 from dotenv import load_dotenv
 import os
+import asyncio
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, Annotated, Sequence
+from typing import TypedDict, Annotated, Sequence, List, Optional, Tuple
 from langchain_core.messages import BaseMessage, SystemMessage, HumanMessage, ToolMessage
 from operator import add as add_messages
 from langchain_openai import ChatOpenAI
 from langchain_openai import OpenAIEmbeddings
-from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_core.tools import tool
+from langchain_core.tools import tool, InjectedToolArg
+from langchain_core.runnables import RunnableLambda
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[3]))
+from common.llm_cache import enable_llm_cache
+from rag_index import sync_pdfs
+from parallel_pdf_loader import list_pdfs
+from semantic_cache import SemanticCache
+from context_packer import ContextPacker
+from sharded_retriever import ShardedRetriever, shard_name
 
 load_dotenv()
 
-llm = ChatOpenAI(
-    model="gpt-4o", temperature = 0) # I want to minimize hallucination - temperature = 0 makes the model output more deterministic 
-
-# Our Embedding Model - has to also be compatible with the LLM
-embeddings = OpenAIEmbeddings(
-    model="text-embedding-3-small",
-)
-
-
-pdf_path = "infosys-ar-25.pdf"
-
-
-# Safety measure I have put for debugging purposes :)
-print(str(os.path))
-if not os.path.exists(pdf_path):
-    raise FileNotFoundError(f"PDF file not found: {pdf_path}")
-
-pdf_loader = PyPDFLoader(pdf_path) # This loads the PDF
-
-# Checks if the PDF is there
-try:
-    pages = pdf_loader.load()
-    print(f"PDF has been loaded and has {len(pages)} pages")
-except Exception as e:
-    print(f"Error loading PDF: {e}")
-    raise
-
-# Chunking Process
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=200
-)
-
-
-pages_split = text_splitter.split_documents(pages) # We now apply this to our pages
-
+pdf_path = "infosys-ar-25.pdf" # A single PDF or a directory of PDFs
 persist_directory = r"collections" # This is where we will store our vector store   
-collection_name = "annual_report"
-
-# If our collection does not exist in the directory, we create using the os command
-if not os.path.exists(persist_directory):
-    os.makedirs(persist_directory)
 
-
-try:
-    # Here, we actually create the chroma database using our embeddigns model
-    vectorstore = Chroma.from_documents(
-        documents=pages_split,
-        embedding=embeddings,
-        persist_directory=persist_directory,
-        collection_name=collection_name
+# Created in main(): PDF parsing runs in spawned worker processes that re-import this
+# script, and they must not build the OpenAI clients, caches and vector stores again
+llm = None
+sharded_store = None
+context_packer = None
+answer_cache = None
+
+
+def setup_vector_store(embeddings) -> ShardedRetriever:
+    """Open one shard per PDF and (re-)ingest whatever changed since the last run."""
+    # Safety measure I have put for debugging purposes :)
+    print(str(os.path))
+    if not os.path.exists(pdf_path):
+        raise FileNotFoundError(f"PDF file not found: {pdf_path}")
+
+    # Chunking Process
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=1000,
+        chunk_overlap=200
     )
-    print(f"Created ChromaDB vector store!")
-    
-except Exception as e:
-    print(f"Error setting up ChromaDB: {str(e)}")
-    raise
 
-
-# Now we create our retriever 
-retriever = vectorstore.as_retriever(
-    search_type="similarity",
-    search_kwargs={"k": 5} # K is the amount of chunks to return
-)
-
-@tool
-def retriever_tool(query: str) -> str:
+    # If our collection does not exist in the directory, we create using the os command
+    if not os.path.exists(persist_directory):
+        os.makedirs(persist_directory)
+
+    try:
+        # One collection (shard) per PDF; only what changed in each PDF is re-embedded.
+        # RAG_VECTOR_BACKEND=mmap keeps each shard in a memory-mapped NumPy file instead of
+        # Chroma (RAG_MMAP_DTYPE=float16/int8 shrinks it 2x/4x); see mmap_vector_store.py
+        sharded_store = ShardedRetriever(embeddings, persist_directory)
+        for shard_pdf in list_pdfs(pdf_path):
+            shard = shard_name(shard_pdf)
+            vectorstore = sharded_store.add_shard(shard)
+            # Remembers the fingerprint of the ingested file so an unchanged PDF is not re-embedded
+            sync_stats = sync_pdfs(vectorstore, [shard_pdf], text_splitter, sharded_store.manifest_path(shard))
+            print(f"{sharded_store.backend} shard '{shard}' ready: {sync_stats}")
+        return sharded_store
+
+    except Exception as e:
+        print(f"Error setting up the vector store: {str(e)}")
+        raise
+
+
+@tool(response_format="content_and_artifact")
+def retriever_tool(
+    query: str,
+    shards: Optional[List[str]] = None,
+    sent_chunk_ids: Annotated[Optional[List[str]], InjectedToolArg] = None,
+) -> Tuple[str, List[str]]:
     """
     This tool searches and returns the information from the Annual Report for 2024-25 for document.
+    Pass `shards` (document names) to search only those documents; by default all are searched.
     """
+    # sent_chunk_ids is filled in by take_action (it is hidden from the LLM); the ids of the
+    # chunks returned here travel back as the ToolMessage artifact
+
+    unknown = [name for name in shards or [] if name not in sharded_store.shards]
+    if unknown:
+        # Never fall back to all documents: the answer could come from another company's or year's report
+        return (f"Unknown document(s): {', '.join(unknown)}. "
+                f"Available documents: {', '.join(sharded_store.shards)}"), []
 
-    docs = retriever.invoke(query)
+    docs = sharded_store.search(query, k=5, shards=shards) # k is the amount of chunks to return
 
     if not docs:
-        return "I found no relevant information in the Annual Report for 2024-25 document."
-    
-    results = []
-    for i, doc in enumerate(docs):
-        results.append(f"Document {i+1}:\n{doc.page_content}")
+        return "I found no relevant information in the Annual Report for 2024-25 document.", []
+
+    context, included_ids = context_packer.pack(docs, sent_chunk_ids or [])
+    if not context:
+        return "The most relevant passages for this query were already provided earlier in the conversation.", []
     
-    return "\n\n".join(results)
+    return context, included_ids
 
 
 tools = [retriever_tool]
 
-llm = llm.bind_tools(tools)
-
 class AgentState(TypedDict):
     messages: Annotated[Sequence[BaseMessage], add_messages]
 
@@ -129,34 +130,92 @@ def call_llm(state: AgentState) -> AgentState:
     return {'messages': [message]}
 
 
+async def acall_llm(state: AgentState) -> AgentState:
+    """Async version of call_llm, used by rag_agent.ainvoke / astream."""
+    messages = list(state['messages'])
+    messages = [SystemMessage(content=system_prompt)] + messages
+    message = await llm.ainvoke(messages)
+    return {'messages': [message]}
+
+
 # Retriever Agent
+def _resolve_tool(t):
+    """Return the tool for a tool call, or None (after logging) if the LLM named an unknown tool."""
+    print(f"Calling Tool: {t['name']} with query: {t['args'].get('query', 'No query provided')}")
+    if not t['name'] in tools_dict: # Checks if a valid tool is present
+        print(f"\nTool: {t['name']} does not exist.")
+        return None
+    return tools_dict[t['name']]
+
+
+def _sent_chunk_ids(state: AgentState) -> List[str]:
+    """Ids of the chunks earlier tool calls in this conversation already gave to the LLM."""
+    return [cid for m in state['messages'] if isinstance(m, ToolMessage) and m.artifact for cid in m.artifact]
+
+
+def _tool_call_input(t, selected_tool, sent_chunk_ids: List[str]) -> dict:
+    """The ToolCall to invoke the tool with (returns a ToolMessage carrying the artifact)."""
+    args = {**t['args'], 'query': t['args'].get('query', '')}
+    if 'sent_chunk_ids' in selected_tool.args:
+        args['sent_chunk_ids'] = sent_chunk_ids
+    return {'type': 'tool_call', 'id': t['id'], 'name': t['name'], 'args': args}
+
+
+def _tool_message(t, result: Optional[ToolMessage]) -> ToolMessage:
+    if result is None:
+        return ToolMessage(tool_call_id=t['id'], name=t['name'],
+                           content="Incorrect Tool Name, Please Retry and Select tool from List of Available tools.")
+    print(f"Result length: {len(str(result.content))}")
+    return result
+
+
 def take_action(state: AgentState) -> AgentState:
     """Execute tool calls from the LLM's response."""
 
     tool_calls = state['messages'][-1].tool_calls
+    sent_chunk_ids = _sent_chunk_ids(state)
     results = []
     for t in tool_calls:
-        print(f"Calling Tool: {t['name']} with query: {t['args'].get('query', 'No query provided')}")
-        
-        if not t['name'] in tools_dict: # Checks if a valid tool is present
-            print(f"\nTool: {t['name']} does not exist.")
-            result = "Incorrect Tool Name, Please Retry and Select tool from List of Available tools."
-        
-        else:
-            result = tools_dict[t['name']].invoke(t['args'].get('query', ''))
-            print(f"Result length: {len(str(result))}")
-            
-
+        selected_tool = _resolve_tool(t)
+        result = selected_tool.invoke(_tool_call_input(t, selected_tool, sent_chunk_ids)) if selected_tool else None
         # Appends the Tool Message
-        results.append(ToolMessage(tool_call_id=t['id'], name=t['name'], content=str(result)))
+        results.append(_tool_message(t, result))
+        if result is not None and result.artifact:
+            sent_chunk_ids = sent_chunk_ids + list(result.artifact)
+
+    print("Tools Execution Complete. Back to the model!")
+    return {'messages': results}
+
+
+async def atake_action(state: AgentState) -> AgentState:
+    """Async version of take_action: all tool calls of one LLM turn run concurrently.
+
+    Chunks sent in earlier turns are filtered out; calls of the same turn run
+    in parallel and so cannot see each other's chunks.
+    """
+
+    tool_calls = state['messages'][-1].tool_calls
+    sent_chunk_ids = _sent_chunk_ids(state)
+
+    async def run(t):
+        selected_tool = _resolve_tool(t)
+        if selected_tool is None:
+            return None
+        return await selected_tool.ainvoke(_tool_call_input(t, selected_tool, sent_chunk_ids))
+
+    # gather keeps the results in the order of the tool calls
+    outputs = await asyncio.gather(*(run(t) for t in tool_calls))
+    results = [_tool_message(t, result) for t, result in zip(tool_calls, outputs)]
 
     print("Tools Execution Complete. Back to the model!")
     return {'messages': results}
 
 
+# Each node has a sync and an async implementation, so the graph supports
+# invoke/stream as well as ainvoke/astream
 graph = StateGraph(AgentState)
-graph.add_node("llm", call_llm)
-graph.add_node("retriever_agent", take_action)
+graph.add_node("llm", RunnableLambda(call_llm, afunc=acall_llm))
+graph.add_node("retriever_agent", RunnableLambda(take_action, afunc=atake_action))
 
 graph.add_conditional_edges(
     "llm",
@@ -169,20 +228,53 @@ graph.set_entry_point("llm")
 rag_agent = graph.compile()
 
 
-def running_agent():
+async def answer_question(question: str) -> str:
+    messages = [HumanMessage(content=question)] # converts back to a HumanMessage type
+    result = await rag_agent.ainvoke({"messages": messages})
+    return result['messages'][-1].content
+
+
+async def running_agent():
     print("\n=== RAG AGENT===")
     
+    # One event loop for the whole session, so the async OpenAI client is reused between questions
     while True:
-        user_input = input("\nWhat is your question: ")
+        user_input = await asyncio.to_thread(input, "\nWhat is your question: ")
         if user_input.lower() in ['exit', 'quit']:
             break
-            
-        messages = [HumanMessage(content=user_input)] # converts back to a HumanMessage type
 
-        result = rag_agent.invoke({"messages": messages})
+        answer, cached = await answer_cache.aget_or_compute(user_input, lambda: answer_question(user_input))
         
-        print("\n=== ANSWER ===")
-        print(result['messages'][-1].content)
+        print("\n=== ANSWER ===" + (" (from semantic cache)" if cached else ""))
+        print(answer)
+
+    print(f"\nSemantic cache: {answer_cache.stats()}")
+
+
+def main():
+    global llm, sharded_store, context_packer, answer_cache, system_prompt
+
+    enable_llm_cache()
+
+    # I want to minimize hallucination - temperature = 0 makes the model output more deterministic 
+    llm = ChatOpenAI(model="gpt-4o", temperature = 0).bind_tools(tools)
+
+    # Our Embedding Model - has to also be compatible with the LLM
+    embeddings = OpenAIEmbeddings(
+        model="text-embedding-3-small",
+    )
+
+    sharded_store = setup_vector_store(embeddings)
+    system_prompt += f"Available documents (shards): {', '.join(sharded_store.shards)}\n"
+
+    # Deduplicates, merges and token-budgets the chunks returned to the LLM
+    context_packer = ContextPacker()
+
+    # Questions that mean the same as an earlier one are answered without running the graph
+    answer_cache = SemanticCache(embeddings)
+
+    asyncio.run(running_agent())
 
 
-running_agent()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,94 @@
+# context_packer.py
+# Turns retrieved chunks into a compact context block for one tool call:
+#   1. drops chunks that were already sent earlier in the conversation,
+#   2. merges neighbouring chunks that overlap (the splitter repeats up to
+#      chunk_overlap characters between consecutive chunks),
+#   3. trims the result to a token budget.
+import os
+from typing import Iterable, List, Tuple
+import tiktoken
+from rag_index import chunk_id
+
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RAG_RETRIEVAL_TOKEN_BUDGET", "1500"))
+
+
+def doc_id(doc) -> str:
+    """Id of a retrieved chunk: the vector store id, or its content hash when the store did not return one."""
+    return getattr(doc, "id", None) or chunk_id(doc)
+
+
+def _overlap(left: str, right: str, min_overlap: int, max_overlap: int) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right` (0 if below min_overlap)."""
+    for size in range(min(len(left), len(right), max_overlap), min_overlap - 1, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+class ContextPacker:
+    def __init__(self, token_budget: int = RETRIEVAL_TOKEN_BUDGET, model: str = "gpt-4o",
+                 min_overlap: int = 20, max_overlap: int = 400):
+        self.token_budget = token_budget
+        self.encoding = tiktoken.encoding_for_model(model)
+        self.min_overlap = min_overlap
+        self.max_overlap = max_overlap
+
+    def _merge_neighbours(self, blocks: List[dict]) -> List[dict]:
+        """Merge blocks from the same page whose texts overlap; a merged block keeps its best rank."""
+        merged = True
+        while merged:
+            merged = False
+            for i, a in enumerate(blocks):
+                for b in blocks[i + 1:]:
+                    if a["key"] != b["key"]:
+                        continue
+                    for left, right in ((a, b), (b, a)):
+                        size = _overlap(left["text"], right["text"], self.min_overlap, self.max_overlap)
+                        if size:
+                            shift = len(left["text"]) - size  # where `right` starts in the merged text
+                            a["text"] = left["text"] + right["text"][size:]
+                            a["ids"] = left["ids"] + right["ids"]
+                            a["ends"] = left["ends"] + [end + shift for end in right["ends"]]
+                            a["rank"] = min(a["rank"], b["rank"])
+                            blocks.remove(b)
+                            merged = True
+                            break
+                    if merged:
+                        break
+                if merged:
+                    break
+        return sorted(blocks, key=lambda block: block["rank"])
+
+    def pack(self, docs: Iterable, sent_ids: Iterable[str] = ()) -> Tuple[str, List[str]]:
+        """Return (context text, ids of the chunks included in it)."""
+        sent_ids = set(sent_ids)
+        blocks = []
+        for rank, doc in enumerate(docs):
+            cid = doc_id(doc)
+            if cid in sent_ids or any(cid in block["ids"] for block in blocks):
+                continue
+            key = (doc.metadata.get("source"), doc.metadata.get("page"))
+            # "ends": where each chunk's text ends inside the block text, so a truncated block
+            # can tell which of its chunks were sent in full
+            blocks.append({"key": key, "text": doc.page_content, "ids": [cid], "ends": [len(doc.page_content)],
+                           "rank": rank})
+
+        results, included, used = [], [], 0
+        for block in self._merge_neighbours(blocks):
+            header = f"Document {len(results) + 1}:\n"
+            tokens = self.encoding.encode_ordinary(header + block["text"])
+            remaining = self.token_budget - used
+            if remaining <= 0:
+                break
+            if len(tokens) > remaining:
+                # Keep the most relevant part that fits rather than dropping the block entirely, but only
+                # report the chunks sent in full: the cut-off ones must stay eligible for later calls
+                text = self.encoding.decode(tokens[:remaining])
+                results.append(text)
+                sent_chars = len(text.rstrip("\ufffd")) - len(header)  # a cut multi-byte char decodes to U+FFFD
+                included.extend(cid for cid, end in zip(block["ids"], block["ends"]) if end <= sent_chars)
+                break
+            results.append(header + block["text"])
+            included.extend(block["ids"])
+            used += len(tokens)
+        return "\n\n".join(results), included
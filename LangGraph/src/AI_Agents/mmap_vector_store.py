@@ -0,0 +1,254 @@
+# mmap_vector_store.py
+# Compact local vector store: embeddings in a memory-mapped NumPy file,
+# chunk text and metadata in a small SQLite file next to it.
+#
+#   {name}.vectors   raw row-major matrix (float32, float16 or int8 codes)
+#   {name}.scales    one float32 scale per row (int8 only)
+#   {name}.sqlite    row -> id, source, text, metadata
+#
+# Opening a store maps the files instead of reading them, so start-up takes
+# milliseconds whatever the corpus size, and only the pages touched by a
+# search count towards RSS. Vectors are stored L2-normalized, so a search is a
+# single (block-wise) matrix-vector product.
+import os
+import json
+import sqlite3
+import threading
+import uuid
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+SEARCH_BLOCK_ROWS = 65536  # rows converted to float32 at a time for float16/int8 stores
+SQL_BATCH = 500  # ids per "IN (...)" query, below SQLite's bound-parameter limit
+
+
+class MmapVectorStore(VectorStore):
+    def __init__(self, embedding_function, persist_directory: str, collection_name: str,
+                 dtype: str = "float32"):
+        if dtype not in ("float32", "float16", "int8"):
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        os.makedirs(persist_directory, exist_ok=True)
+        self._embedding_function = embedding_function
+        self.dtype = np.dtype(dtype)
+        base = os.path.join(persist_directory, collection_name)
+        self._vectors_path = base + ".vectors"
+        self._scales_path = base + ".scales"
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(base + ".sqlite", check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, source TEXT, text TEXT, metadata TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        stored = dict(self._conn.execute("SELECT key, value FROM settings").fetchall())
+        if stored.get("dtype", dtype) != dtype:
+            raise ValueError(f"{base} was created with dtype {stored['dtype']}, not {dtype}")
+        self.dim = int(stored["dim"]) if "dim" in stored else None
+        self._conn.execute("INSERT OR REPLACE INTO settings VALUES ('dtype', ?)", (dtype,))
+        self._conn.commit()
+        self._matrix = None  # cached memmaps, dropped whenever the files change
+        self._scales = None
+
+    @property
+    def embeddings(self):
+        return self._embedding_function
+
+    # ---------------- storage ----------------
+    def _count(self) -> int:
+        if self.dim is None or not os.path.exists(self._vectors_path):
+            return 0
+        return os.path.getsize(self._vectors_path) // (self.dim * self.dtype.itemsize)
+
+    def _maps(self):
+        """(vectors, scales) memmaps for the current files; scales is None unless int8."""
+        if self._matrix is None:
+            count = self._count()
+            if count == 0:
+                return None, None
+            self._matrix = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(count, self.dim))
+            if self.dtype == np.int8:
+                self._scales = np.memmap(self._scales_path, dtype=np.float32, mode="r", shape=(count,))
+        return self._matrix, self._scales
+
+    def _encode(self, vectors) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Normalize (and quantize) float vectors into the on-disk representation."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        if self.dtype == np.int8:
+            scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+            return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+        return vectors.astype(self.dtype), None
+
+    def upsert_vectors(self, ids: List[str], embeddings, documents: List[str], metadatas: List[dict]):
+        """Store precomputed embeddings; existing ids are overwritten in place, new ids are appended."""
+        codes, scales = self._encode(embeddings)
+        with self._lock:
+            if self.dim is None:
+                self.dim = codes.shape[1]
+                self._conn.execute("INSERT OR REPLACE INTO settings VALUES ('dim', ?)", (str(self.dim),))
+            elif codes.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {codes.shape[1]}")
+
+            placeholders = ",".join("?" * len(ids))
+            known = dict(self._conn.execute(f"SELECT id, row FROM chunks WHERE id IN ({placeholders})", ids))
+            self._matrix = self._scales = None
+            next_row = self._count()
+            new = [i for i, chunk_id in enumerate(ids) if chunk_id not in known]
+
+            if known:
+                matrix = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+", shape=(next_row, self.dim))
+                scale_map = (np.memmap(self._scales_path, dtype=np.float32, mode="r+", shape=(next_row,))
+                             if scales is not None else None)
+                for i, chunk_id in enumerate(ids):
+                    if chunk_id in known:
+                        matrix[known[chunk_id]] = codes[i]
+                        if scale_map is not None:
+                            scale_map[known[chunk_id]] = scales[i]
+                matrix.flush()
+                del matrix, scale_map
+            if new:
+                with open(self._vectors_path, "ab") as f:
+                    f.write(codes[new].tobytes())
+                if scales is not None:
+                    with open(self._scales_path, "ab") as f:
+                        f.write(scales[new].tobytes())
+
+            rows = {chunk_id: row for chunk_id, row in known.items()}
+            rows.update({ids[i]: next_row + n for n, i in enumerate(new)})
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, source, text, metadata) VALUES (?, ?, ?, ?, ?)",
+                [(rows[chunk_id], chunk_id, (meta or {}).get("source"), text, json.dumps(meta or {}))
+                 for chunk_id, text, meta in zip(ids, documents, metadatas)],
+            )
+            self._conn.commit()
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None, include=None) -> dict:
+        """Chroma-style get(); `where` supports {"source": value} and {"source": {"$in": [...]}}.
+
+        Returns ids, plus metadatas when `include` contains "metadatas".
+        """
+        query, params = "SELECT id, metadata FROM chunks", []
+        if where:
+            ((field, condition),) = where.items()
+            if field != "source":
+                raise ValueError("MmapVectorStore can only filter on 'source'")
+            values = condition["$in"] if isinstance(condition, dict) else [condition]
+            query += f" WHERE source IN ({','.join('?' * len(values))})"
+            params = list(values)
+        with self._lock:
+            found = self._conn.execute(query, params).fetchall()
+        if ids is not None:
+            wanted = set(ids)
+            found = [(chunk_id, meta) for chunk_id, meta in found if chunk_id in wanted]
+        result = {"ids": [chunk_id for chunk_id, _ in found]}
+        if include and "metadatas" in include:
+            result["metadatas"] = [json.loads(meta) for _, meta in found]
+        return result
+
+    def update_metadatas(self, ids: List[str], metadatas: List[dict]):
+        """Replace the metadata of existing chunks, keeping their text and vectors."""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE chunks SET source = ?, metadata = ? WHERE id = ?",
+                [((meta or {}).get("source"), json.dumps(meta or {}), chunk_id)
+                 for chunk_id, meta in zip(ids, metadatas)],
+            )
+            self._conn.commit()
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs) -> None:
+        """Delete chunks and compact the vector file (deletes only happen while ingesting)."""
+        if not ids:
+            return
+        with self._lock:
+            batches = [ids[i:i + SQL_BATCH] for i in range(0, len(ids), SQL_BATCH)]
+            dropped = set()
+            for batch in batches:
+                dropped.update(row for (row,) in self._conn.execute(
+                    f"SELECT row FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch))
+            if not dropped:
+                return
+            matrix, scales = self._maps()
+            keep = np.setdiff1d(np.arange(len(matrix), dtype=np.int64), np.fromiter(dropped, dtype=np.int64))
+            for path, source in ((self._vectors_path, matrix), (self._scales_path, scales)):
+                if source is None:
+                    continue
+                with open(path + ".tmp", "wb") as f:
+                    for start in range(0, len(keep), SEARCH_BLOCK_ROWS):
+                        f.write(np.ascontiguousarray(source[keep[start:start + SEARCH_BLOCK_ROWS]]).tobytes())
+            self._matrix = self._scales = None
+            del matrix, scales
+            for path in (self._vectors_path, self._scales_path):
+                if os.path.exists(path + ".tmp"):
+                    os.replace(path + ".tmp", path)
+
+            for batch in batches:
+                self._conn.execute(f"DELETE FROM chunks WHERE id IN ({','.join('?' * len(batch))})", batch)
+            # Renumber in ascending order: every target row is already free when it is reused
+            self._conn.executemany(
+                "UPDATE chunks SET row = ? WHERE row = ?",
+                [(new_row, int(old_row)) for new_row, old_row in enumerate(keep) if new_row != old_row],
+            )
+            self._conn.commit()
+
+    # ---------------- search ----------------
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        matrix, scales = self._maps()
+        if matrix is None:
+            return np.empty(0, dtype=np.float32)
+        if self.dtype == np.float32:
+            return np.asarray(matrix @ query)
+        scores = np.empty(len(matrix), dtype=np.float32)
+        for start in range(0, len(matrix), SEARCH_BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + len(block)] = block @ query
+        if scales is not None:
+            scores *= scales
+        return scores
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k: int = 4, **kwargs):
+        """Top-k (Document, distance) pairs; distance is squared L2 between unit vectors, like Chroma's default."""
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        with self._lock:
+            scores = self._scores(query)
+            if len(scores) == 0:
+                return []
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            placeholders = ",".join("?" * len(top))
+            rows = {row: (chunk_id, text, meta) for row, chunk_id, text, meta in self._conn.execute(
+                f"SELECT row, id, text, metadata FROM chunks WHERE row IN ({placeholders})",
+                [int(r) for r in top])}
+        results = []
+        for row in top:
+            if int(row) in rows:
+                chunk_id, text, meta = rows[int(row)]
+                doc = Document(id=chunk_id, page_content=text, metadata=json.loads(meta))
+                results.append((doc, float(2.0 - 2.0 * scores[row])))
+        return results
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k)]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs) -> List[Document]:
+        return self.similarity_search_by_vector(self._embedding_function.embed_query(query), k)
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None,
+                  ids: Optional[List[str]] = None, **kwargs) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        if ids is None:
+            ids = [str(uuid.uuid4()) for _ in texts]
+        self.upsert_vectors(ids, self._embedding_function.embed_documents(texts), texts, metadatas)
+        return ids
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, persist_directory: str = "collections",
+                   collection_name: str = "default", dtype: str = "float32", **kwargs):
+        store = cls(embedding, persist_directory, collection_name, dtype=dtype)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,88 @@
+# parallel_pdf_loader.py
+# Multi-process PDF text extraction.
+#
+# Every file is cut into page ranges and the ranges are parsed by a process
+# pool, so extraction scales with the number of cores both for one large
+# report and for a directory of them. Pages come back in their original order
+# (file by file, page by page) with the same "source"/"page" metadata that
+# PyPDFLoader produces, so the output can go straight into the text splitter.
+#
+# Workers are started with "spawn" (RAG_PDF_START_METHOD): ingestion may run
+# in a thread (e.g. asyncio.to_thread) and forking a threaded process can
+# deadlock. Spawned workers re-import the calling script, so entry points
+# must keep their setup behind `if __name__ == "__main__":`.
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pypdf import PdfReader
+from langchain_core.documents import Document
+
+PDF_WORKERS = int(os.getenv("RAG_PDF_WORKERS", str(os.cpu_count() or 1)))
+PAGES_PER_TASK = int(os.getenv("RAG_PDF_PAGES_PER_TASK", "16"))
+PDF_START_METHOD = os.getenv("RAG_PDF_START_METHOD", "spawn")  # or "forkserver"
+
+
+def list_pdfs(path: str) -> list:
+    """A single PDF path, or every PDF inside a directory (sorted)."""
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith(".pdf")
+        )
+    return [path]
+
+
+def _extract_range(path: str, start: int, stop: int) -> list:
+    """Runs in a worker process: extract the text of pages [start, stop) of one file."""
+    reader = PdfReader(path)
+    total_pages = len(reader.pages)
+    labels = reader.page_labels  # rebuilt for every page on each access, so read it once
+    pages = []
+    for i in range(start, stop):
+        pages.append((i, reader.pages[i].extract_text(), labels[i], total_pages))
+    return pages
+
+
+def _to_documents(path: str, pages: list) -> list:
+    return [
+        Document(
+            page_content=text,
+            metadata={"source": path, "page": i, "page_label": label, "total_pages": total_pages},
+        )
+        for i, text, label, total_pages in pages
+    ]
+
+
+def iter_pages_parallel(paths, max_workers: int = PDF_WORKERS, pages_per_task: int = PAGES_PER_TASK):
+    """Yield one Document per page for every file in `paths`, in order, parsing ranges in parallel.
+
+    Only about two ranges per worker are in flight at any time, so memory
+    stays bounded when the consumer (splitting + embedding) is slower than
+    parsing.
+    """
+    tasks = []
+    for path in paths:
+        page_count = len(PdfReader(path).pages)  # cheap: reads the page tree, not the content
+        tasks.extend((path, start, min(start + pages_per_task, page_count))
+                     for start in range(0, page_count, pages_per_task))
+
+    if max_workers <= 1 or len(tasks) <= 1:
+        for path, start, stop in tasks:
+            yield from _to_documents(path, _extract_range(path, start, stop))
+        return
+
+    mp_context = multiprocessing.get_context(PDF_START_METHOD)
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as pool:
+        task_iter = iter(tasks)
+        pending = deque()
+        for task in task_iter:
+            pending.append((task[0], pool.submit(_extract_range, *task)))
+            if len(pending) >= max_workers * 2:
+                break
+        while pending:
+            path, future = pending.popleft()
+            pages = future.result()
+            next_task = next(task_iter, None)
+            if next_task is not None:
+                pending.append((next_task[0], pool.submit(_extract_range, *next_task)))
+            yield from _to_documents(path, pages)
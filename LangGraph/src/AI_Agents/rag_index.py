@@ -0,0 +1,266 @@
+# rag_index.py
+# Incremental, hash-checked ingestion of PDFs into a persisted vector store collection
+# (Chroma, or MmapVectorStore from mmap_vector_store.py).
+#
+# Every file is fingerprinted first: if none changed since the last run and the
+# collection still holds the number of chunks recorded for each file, it is
+# used as-is (no parsing, no embedding). Otherwise
+# every chunk gets a content-addressed id, so only new or changed chunks are
+# embedded and chunks that disappeared (or belong to removed files) are deleted.
+# Ids do not depend on the page number: when pages are inserted or removed,
+# the chunks that merely moved only get their metadata updated.
+#
+# Pages are streamed: each page is parsed (in a process pool, see
+# parallel_pdf_loader.py), split and queued for embedding as soon as it is
+# ready, so memory stays flat however large the PDFs are and embedding starts
+# right after the first pages.
+#
+# Embedding runs in batches of up to EMBED_BATCH_SIZE chunks with up to
+# EMBED_CONCURRENCY requests in flight; while no request is in flight, the
+# chunks gathered so far go out at once instead of waiting for a full batch.
+# Each batch is written to the collection
+# as soon as it is embedded, so a failed run only has to redo the failed batches.
+import os
+import json
+import time
+import asyncio
+import hashlib
+import tiktoken
+from parallel_pdf_loader import iter_pages_parallel, PDF_WORKERS
+
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "128"))
+EMBED_CONCURRENCY = int(os.getenv("RAG_EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = int(os.getenv("RAG_EMBED_MAX_RETRIES", "3"))
+
+
+def file_fingerprint(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of the file contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(doc) -> str:
+    """Content-addressed chunk id: same source and text always give the same id, on any page."""
+    digest = hashlib.sha256()
+    for part in (doc.metadata.get("source", ""), doc.page_content):
+        digest.update(str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def load_manifest(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path: str, manifest: dict):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)  # atomic, so a crash never leaves a half-written manifest
+
+
+def stored_chunk_count(vectorstore, path: str) -> int:
+    return len(vectorstore.get(where={"source": path}, include=[])["ids"])
+
+
+def upsert_vectors(vectorstore, ids, vectors, texts, metadatas):
+    """Write precomputed embeddings to a Chroma or MmapVectorStore shard."""
+    if hasattr(vectorstore, "upsert_vectors"):
+        vectorstore.upsert_vectors(ids, vectors, texts, metadatas)
+    else:
+        # LangChain's Chroma wrapper has no public method for precomputed embeddings
+        vectorstore._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+
+
+def update_metadatas(vectorstore, ids, metadatas, batch_size: int = EMBED_BATCH_SIZE):
+    """Replace the metadata of chunks already in a Chroma or MmapVectorStore shard (no re-embedding)."""
+    for start in range(0, len(ids), batch_size):
+        batch_ids, batch_metadatas = ids[start:start + batch_size], metadatas[start:start + batch_size]
+        if hasattr(vectorstore, "update_metadatas"):
+            vectorstore.update_metadatas(batch_ids, batch_metadatas)
+        else:
+            vectorstore._collection.update(ids=batch_ids, metadatas=batch_metadatas)
+
+
+async def embed_and_upsert(
+    vectorstore,
+    items,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_concurrency: int = EMBED_CONCURRENCY,
+    max_retries: int = EMBED_MAX_RETRIES,
+    count_tokens: bool = True,
+) -> dict:
+    """Embed a stream of (id, doc) pairs in concurrent batches and upsert each batch into the store.
+
+    `items` may be a lazy iterator; it is consumed in a worker thread and only
+    a few batches are buffered ahead of the embedding workers, so a slow
+    producer (PDF parsing) and the embedding requests overlap.
+
+    A batch that keeps failing after `max_retries` retries (exponential
+    backoff) is skipped while the others carry on; a RuntimeError is raised
+    at the end so the caller does not record the file as fully ingested.
+    Returns throughput stats; token counts need tiktoken's BPE file (downloaded
+    on first use), pass count_tokens=False to skip them.
+    """
+    embeddings = vectorstore.embeddings
+    # tokenizer of the text-embedding-3 models
+    encoding = tiktoken.get_encoding("cl100k_base") if count_tokens else None
+    queue = asyncio.Queue(maxsize=max_concurrency)  # backpressure on the producer
+    stats = {"chunks": 0, "tokens": 0, "batches": 0, "retries": 0, "failed_batches": 0}
+
+    async def run_batch(batch):
+        ids = [item_id for item_id, _ in batch]
+        texts = [doc.page_content for _, doc in batch]
+        for attempt in range(max_retries + 1):
+            try:
+                vectors = await embeddings.aembed_documents(texts)
+                # The vector store clients are synchronous; keep the event loop free while they write
+                await asyncio.to_thread(
+                    upsert_vectors,
+                    vectorstore,
+                    ids,
+                    vectors,
+                    texts,
+                    [doc.metadata for _, doc in batch],
+                )
+                break
+            except Exception as e:
+                if attempt == max_retries:
+                    print(f"Embedding batch of {len(batch)} chunks failed: {e}")
+                    stats["failed_batches"] += 1
+                    return
+                stats["retries"] += 1
+                await asyncio.sleep(2 ** attempt)
+        stats["chunks"] += len(batch)
+        if encoding is not None:
+            stats["tokens"] += sum(len(t) for t in encoding.encode_ordinary_batch(texts))
+        stats["batches"] += 1
+
+    in_flight = 0
+
+    async def worker():
+        nonlocal in_flight
+        while (batch := await queue.get()) is not None:
+            in_flight += 1
+            try:
+                await run_batch(batch)
+            finally:
+                in_flight -= 1
+
+    start = time.perf_counter()
+    workers = [asyncio.create_task(worker()) for _ in range(max_concurrency)]
+    iterator, batch = iter(items), []
+    while (item := await asyncio.to_thread(next, iterator, None)) is not None:
+        batch.append(item)
+        # A partial batch goes out whenever the embedding workers are idle, so the first
+        # request starts after the first page rather than after batch_size chunks
+        if len(batch) == batch_size or (not in_flight and queue.empty()):
+            await queue.put(batch)
+            batch = []
+    if batch:
+        await queue.put(batch)
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - start
+
+    stats["seconds"] = round(elapsed, 3)
+    stats["chunks_per_s"] = round(stats["chunks"] / elapsed, 1) if elapsed else 0.0
+    stats["tokens_per_s"] = round(stats["tokens"] / elapsed, 1) if elapsed else 0.0
+    print(f"Embedded {stats['chunks']} chunks ({stats['tokens']} tokens) in {stats['seconds']}s: "
+          f"{stats['chunks_per_s']} chunks/s, {stats['tokens_per_s']} tokens/s")
+    if stats["failed_batches"]:
+        raise RuntimeError(f"{stats['failed_batches']} embedding batch(es) failed; re-run to retry only those chunks")
+    return stats
+
+
+def iter_new_chunks(pdf_paths, text_splitter, existing: dict, seen: set, moved: dict,
+                    max_workers: int = PDF_WORKERS):
+    """Parse and split the PDFs page by page, yielding (id, chunk) pairs not yet in the collection.
+
+    `existing` maps the stored chunk ids to their metadata. Every chunk id
+    produced by the files is added to `seen`, so the caller can work out which
+    stored chunks are stale once the generator is exhausted; stored chunks
+    whose metadata changed (e.g. they moved to another page) are put in
+    `moved` (id -> new metadata) instead of being yielded.
+    """
+    for page in iter_pages_parallel(pdf_paths, max_workers=max_workers):
+        for doc in text_splitter.split_documents([page]):
+            cid = chunk_id(doc)
+            if cid in seen:  # exact duplicate chunk
+                continue
+            seen.add(cid)
+            if cid not in existing:
+                yield cid, doc
+            elif existing[cid] != doc.metadata:
+                moved[cid] = doc.metadata
+
+
+def sync_pdfs(
+    vectorstore,
+    pdf_paths,
+    text_splitter,
+    manifest_path: str,
+    batch_size: int = EMBED_BATCH_SIZE,
+    max_concurrency: int = EMBED_CONCURRENCY,
+    max_workers: int = PDF_WORKERS,
+) -> dict:
+    """Make the collection mirror exactly the chunks of `pdf_paths` and return what changed."""
+    manifest = load_manifest(manifest_path)
+    # PDF metadata["source"] is the path exactly as it was given
+    fingerprints = {path: file_fingerprint(path) for path in pdf_paths}
+    changed = [p for p, sha in fingerprints.items() if manifest.get(p, {}).get("sha256") != sha]
+    # The manifest is only trusted while the store agrees with it (e.g. not deleted or rebuilt since)
+    changed += [p for p in fingerprints
+                if p not in changed and stored_chunk_count(vectorstore, p) != manifest[p]["chunks"]]
+    removed = [p for p in manifest if p not in fingerprints]
+
+    if not changed and not removed:
+        chunks = sum(entry["chunks"] for entry in manifest.values())
+        return {"status": "unchanged", "added": 0, "deleted": 0, "chunks": chunks}
+
+    deleted = 0
+    for path in removed:
+        ids = vectorstore.get(where={"source": path}, include=[])["ids"]
+        if ids:
+            vectorstore.delete(ids=ids)
+        deleted += len(ids)
+        del manifest[path]
+
+    added, moved, rates = 0, {}, {}
+    if changed:
+        # Only ids and metadata are kept in memory; chunk text lives just long enough to be embedded
+        where = {"source": changed[0]} if len(changed) == 1 else {"source": {"$in": changed}}
+        stored = vectorstore.get(where=where, include=["metadatas"])
+        existing = dict(zip(stored["ids"], stored["metadatas"]))
+        seen = set()
+        embed_stats = asyncio.run(embed_and_upsert(
+            vectorstore,
+            iter_new_chunks(changed, text_splitter, existing, seen, moved, max_workers=max_workers),
+            batch_size=batch_size,
+            max_concurrency=max_concurrency,
+        ))
+        added = embed_stats["chunks"]
+        rates = {k: v for k, v in embed_stats.items() if k.endswith("_per_s")}
+
+        if moved:
+            update_metadatas(vectorstore, list(moved), list(moved.values()), batch_size=batch_size)
+
+        stale_ids = list(existing.keys() - seen)
+        if stale_ids:
+            vectorstore.delete(ids=stale_ids)
+        deleted += len(stale_ids)
+
+        # Only record fingerprints once the collection really matches the files
+        for path in changed:
+            manifest[path] = {"sha256": fingerprints[path], "chunks": stored_chunk_count(vectorstore, path)}
+
+    save_manifest(manifest_path, manifest)
+    chunks = sum(entry["chunks"] for entry in manifest.values())
+    return {"status": "updated", "added": added, "moved": len(moved), "deleted": deleted, "chunks": chunks, **rates}
@@ -0,0 +1,303 @@
+# retrieval_benchmark.py
+# Offline benchmark for the vector store paths used in this repo:
+#   chroma          Chroma collection, filled through rag_index.embed_and_upsert (RAG agent)
+#   faiss           FAISS.from_documents + save_local/load_local (YouTube assistant)
+#   mmap[-float16|-int8]  MmapVectorStore, filled through rag_index.embed_and_upsert
+#
+# No API keys or network are needed: documents are synthetic and the
+# embedding model is a deterministic feature-hashing bag of words, so a
+# query made of words from one chunk really is closest to that chunk.
+# Every backend runs in its own process, so peak memory is per backend.
+#
+# For each backend it reports ingest time, time to reopen the persisted
+# index, p50/p95/p99 search latency, memory, size on disk and recall@k
+# against exact brute-force search over the same embeddings.
+#
+# ingest_s measures each backend's own ingestion path, and those paths differ:
+# FAISS embeds everything in one synchronous from_documents call, while
+# Chroma and mmap go through the async, batched embed_and_upsert. Each result
+# carries an "ingest_path" field so ingest times are not read as like for like.
+#
+#   python retrieval_benchmark.py --out baseline.json
+#   python retrieval_benchmark.py --compare baseline.json   # exits 1 on a regression
+import os
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import asyncio
+import hashlib
+import argparse
+import platform
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from typing import List
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_chroma import Chroma
+from langchain_community.vectorstores import FAISS
+from rag_index import chunk_id, embed_and_upsert
+from mmap_vector_store import MmapVectorStore
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BACKENDS = ("chroma", "faiss", "mmap", "mmap-float16", "mmap-int8")
+INGEST_PATHS = {
+    "faiss": "sync FAISS.from_documents",
+    "upsert": "async batched rag_index.embed_and_upsert",
+}
+LOWER_IS_BETTER = ("ingest_s", "open_ms", "p50_ms", "p95_ms", "p99_ms", "index_rss_mb", "peak_rss_mb", "disk_mb")
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic offline embeddings: signed feature hashing of lower-cased words, L2-normalized."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self._buckets = {}  # word -> (bucket, sign)
+
+    def _bucket(self, word: str):
+        if word not in self._buckets:
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            self._buckets[word] = (value % self.dim, 1.0 if value >> 63 else -1.0)
+        return self._buckets[word]
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in text.lower().split():
+            bucket, sign = self._bucket(word)
+            vector[bucket] += sign
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def make_corpus(num_docs: int, words_per_doc: int, vocab_size: int, seed: int) -> List[Document]:
+    """Synthetic pages with Zipf-distributed words, so common words are shared like in real text."""
+    rng = random.Random(seed)
+    vocab = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(3, 10))) for _ in range(vocab_size)]
+    cum_weights = np.cumsum([1.0 / (rank + 1) for rank in range(vocab_size)]).tolist()
+    return [
+        Document(
+            page_content=" ".join(rng.choices(vocab, cum_weights=cum_weights, k=words_per_doc)),
+            metadata={"source": f"synthetic-{i // 10}.pdf", "page": i % 10},
+        )
+        for i in range(num_docs)
+    ]
+
+
+def make_queries(chunks: List[Document], num_queries: int, query_words: int, seed: int) -> List[str]:
+    """Each query is a run of consecutive words taken from a random chunk."""
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(num_queries):
+        words = rng.choice(chunks).page_content.split()
+        start = rng.randrange(max(1, len(words) - query_words))
+        queries.append(" ".join(words[start:start + query_words]))
+    return queries
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(0, math.ceil(pct / 100 * len(values)) - 1)
+    return values[rank]
+
+
+def _rss_mb() -> float:
+    """Current resident set size (falls back to the peak where /proc is not available)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb() -> float:
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10  # bytes on macOS, KiB on Linux
+
+
+def _disk_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 2 ** 20
+
+
+def _build(backend: str, embeddings, items, workdir: str):
+    """Ingest `items` ((id, chunk) pairs) and return a function that reopens the persisted index."""
+    if backend == "faiss":
+        # Same call as create_vector_store_from_youtube()
+        store = FAISS.from_documents([doc for _, doc in items], embeddings, ids=[cid for cid, _ in items])
+        store.save_local(workdir)
+        return lambda: FAISS.load_local(workdir, embeddings, allow_dangerous_deserialization=True)
+
+    if backend == "chroma":
+        def open_store():
+            return Chroma(collection_name="benchmark", embedding_function=embeddings, persist_directory=workdir)
+    else:
+        dtype = backend.split("-", 1)[1] if "-" in backend else "float32"
+
+        def open_store():
+            return MmapVectorStore(embeddings, workdir, "benchmark", dtype=dtype)
+    # count_tokens=False: tiktoken would download its BPE file, and the benchmark must run offline
+    asyncio.run(embed_and_upsert(open_store(), iter(items), count_tokens=False))
+    return open_store
+
+
+def _search(store, vector, k: int):
+    if isinstance(store, FAISS):
+        return store.similarity_search_with_score_by_vector(vector, k=k)
+    return store.similarity_search_by_vector_with_relevance_scores(vector, k=k)
+
+
+def run_backend(backend: str, config: dict) -> dict:
+    """Runs in a fresh worker process: build, reopen and query one backend."""
+    embeddings = HashingEmbeddings(config["dim"])
+    splitter = RecursiveCharacterTextSplitter(chunk_size=config["chunk_size"], chunk_overlap=config["chunk_overlap"])
+    chunks = splitter.split_documents(make_corpus(config["docs"], config["doc_words"], config["vocab"], config["seed"]))
+    items = list({cid: doc for cid, doc in ((chunk_id(doc), doc) for doc in chunks)}.items())
+    queries = make_queries(chunks, config["queries"] + config["warmup"], config["query_words"], config["seed"])
+    k = config["k"]
+
+    # Ground truth: exact cosine top-k over the same embeddings (not timed)
+    ids = [cid for cid, _ in items]
+    matrix = np.asarray(embeddings.embed_documents([doc.page_content for _, doc in items]), dtype=np.float32)
+    query_vectors = embeddings.embed_documents(queries)
+    scores = np.asarray(query_vectors, dtype=np.float32) @ matrix.T
+    exact = [set(ids[i] for i in np.argsort(-row)[:k]) for row in scores]
+    del matrix, scores
+
+    workdir = tempfile.mkdtemp(prefix=f"retrieval-benchmark-{backend}-")
+    try:
+        rss_before = _rss_mb()
+        start = time.perf_counter()
+        open_store = _build(backend, embeddings, items, workdir)
+        ingest_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = open_store()
+        open_ms = (time.perf_counter() - start) * 1000
+
+        latencies, hits = [], 0
+        for i, vector in enumerate(query_vectors):
+            start = time.perf_counter()
+            results = _search(store, vector, k)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if i < config["warmup"]:
+                continue
+            latencies.append(elapsed_ms)
+            found = {getattr(doc, "id", None) or chunk_id(doc) for doc, _ in results}
+            hits += len(found & exact[i])
+        latencies.sort()
+        return {
+            "chunks": len(items),
+            "ingest_path": INGEST_PATHS["faiss" if backend == "faiss" else "upsert"],
+            "ingest_s": round(ingest_s, 3),
+            "ingest_chunks_per_s": round(len(items) / ingest_s, 1) if ingest_s else 0.0,
+            "open_ms": round(open_ms, 2),
+            "p50_ms": round(_percentile(latencies, 50), 3),
+            "p95_ms": round(_percentile(latencies, 95), 3),
+            "p99_ms": round(_percentile(latencies, 99), 3),
+            "recall_at_k": round(hits / (k * len(latencies)), 4) if latencies else 0.0,
+            "index_rss_mb": round(_rss_mb() - rss_before, 1),
+            "peak_rss_mb": round(_peak_rss_mb(), 1),
+            "disk_mb": round(_disk_mb(workdir), 2),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_benchmark(backends, config: dict) -> dict:
+    results = {}
+    for backend in backends:
+        print(f"--- {backend} ---")
+        # spawn: every backend starts from a clean interpreter, so memory numbers do not leak between them
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            results[backend] = pool.submit(run_backend, backend, config).result()
+        print(json.dumps(results[backend]))
+    return {
+        "config": config,
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpus": os.cpu_count(), "numpy": np.__version__},
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float, recall_tolerance: float) -> List[str]:
+    """Print metric changes against a baseline run and return the regressions."""
+    if current["config"] != baseline.get("config"):
+        print("Warning: benchmark config differs from the baseline; numbers are not directly comparable")
+    regressions = []
+    for backend, result in current["results"].items():
+        before = baseline.get("results", {}).get(backend)
+        if before is None:
+            print(f"{backend}: not in baseline")
+            continue
+        for metric in LOWER_IS_BETTER + ("recall_at_k",):
+            now, was = result.get(metric), before.get(metric)
+            if now is None or was is None:
+                continue
+            if metric == "recall_at_k":
+                worse = now < was - recall_tolerance
+            else:
+                worse = was > 0 and (now - was) / was > tolerance
+            change = f"{(now - was) / was:+.1%}" if was else "n/a"
+            flag = "  <-- regression" if worse else ""
+            print(f"{backend:>13} {metric:>14}: {was} -> {now} ({change}){flag}")
+            if worse:
+                regressions.append(f"{backend}.{metric}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline ingestion/search benchmark for the vector stores")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--docs", type=int, default=2000, help="number of synthetic pages")
+    parser.add_argument("--doc-words", type=int, default=400, help="words per synthetic page")
+    parser.add_argument("--vocab", type=int, default=20000, help="vocabulary size of the synthetic text")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384, help="embedding dimension")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--warmup", type=int, default=20, help="queries run before timing starts")
+    parser.add_argument("--query-words", type=int, default=12)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default="retrieval_benchmark.json", help="where to write this run's results")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="relative slowdown/growth counted as a regression")
+    parser.add_argument("--recall-tolerance", type=float, default=0.01,
+                        help="absolute recall drop counted as a regression")
+    args = parser.parse_args()
+
+    config = {name: getattr(args, name) for name in (
+        "docs", "doc_words", "vocab", "chunk_size", "chunk_overlap", "dim",
+        "queries", "warmup", "query_words", "k", "seed")}
+    report = run_benchmark(args.backends, config)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.recall_tolerance)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}")
+            sys.exit(1)
@@ -0,0 +1,120 @@
+# semantic_cache.py
+# In-memory semantic answer cache for the RAG agent.
+#
+# A question is embedded and compared (cosine similarity) with the questions
+# answered before; above the threshold the stored answer is returned and the
+# whole agent graph (LLM calls + retrieval) is skipped.
+import os
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional, Tuple
+import numpy as np
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("RAG_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("RAG_SEMANTIC_CACHE_MAX_ENTRIES", "512"))
+
+
+class SemanticCache:
+    """LRU cache of answers keyed by question embeddings."""
+
+    def __init__(self, embeddings, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # normalized question -> (unit vector, answer), oldest first
+        self._matrix = None  # stacked vectors of _entries, rebuilt lazily after inserts/evictions
+        self._keys = []
+
+    @staticmethod
+    def _normalize(question: str) -> str:
+        return " ".join(question.lower().split())
+
+    @staticmethod
+    def _unit(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _embed(self, question: str) -> np.ndarray:
+        return self._unit(self.embeddings.embed_query(question))
+
+    async def _aembed(self, question: str) -> np.ndarray:
+        return self._unit(await self.embeddings.aembed_query(question))
+
+    def _best_match(self, vector: np.ndarray) -> Tuple[Optional[str], float]:
+        if not self._entries:
+            return None, 0.0
+        if self._matrix is None:
+            self._keys = list(self._entries)
+            self._matrix = np.stack([self._entries[k][0] for k in self._keys])
+        scores = self._matrix @ vector
+        best = int(np.argmax(scores))
+        return self._keys[best], float(scores[best])
+
+    def _lookup_exact(self, key: str) -> Optional[str]:
+        if key not in self._entries:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return self._entries[key][1]
+
+    def _lookup_vector(self, vector: np.ndarray) -> Tuple[Optional[str], float, np.ndarray]:
+        match, score = self._best_match(vector)
+        if match is not None and score >= self.threshold:
+            self._entries.move_to_end(match)
+            self.hits += 1
+            return self._entries[match][1], score, vector
+        self.misses += 1
+        return None, score, vector
+
+    def lookup(self, question: str) -> Tuple[Optional[str], float, Optional[np.ndarray]]:
+        """Return (answer or None, similarity, question vector); the vector can be reused by store()."""
+        answer = self._lookup_exact(self._normalize(question))
+        if answer is not None:  # exact repeat: no embedding call needed
+            return answer, 1.0, None
+        return self._lookup_vector(self._embed(question))
+
+    async def alookup(self, question: str) -> Tuple[Optional[str], float, Optional[np.ndarray]]:
+        """Async version of lookup()."""
+        answer = self._lookup_exact(self._normalize(question))
+        if answer is not None:
+            return answer, 1.0, None
+        return self._lookup_vector(await self._aembed(question))
+
+    def store(self, question: str, answer: str, vector: Optional[np.ndarray] = None):
+        key = self._normalize(question)
+        if vector is None:
+            vector = self._embed(question)
+        self._entries[key] = (vector, answer)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)  # least recently used
+        self._matrix = None
+
+    def get_or_compute(self, question: str, compute: Callable[[], str]) -> Tuple[str, bool]:
+        """Return (answer, was_cached), calling `compute()` and storing its answer on a miss."""
+        answer, _, vector = self.lookup(question)
+        if answer is not None:
+            return answer, True
+        answer = compute()
+        self.store(question, answer, vector)
+        return answer, False
+
+    async def aget_or_compute(self, question: str, compute: Callable[[], Awaitable[str]]) -> Tuple[str, bool]:
+        """Async version of get_or_compute(); `compute` is a coroutine function."""
+        answer, _, vector = await self.alookup(question)
+        if answer is not None:
+            return answer, True
+        answer = await compute()
+        self.store(question, answer, vector)
+        return answer, False
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+        }
@@ -0,0 +1,79 @@
+# sharded_retriever.py
+# One vector store collection per document (e.g. one annual report per company/year).
+#
+# A query is embedded once and sent to all selected shards in parallel; the
+# per-shard top-k lists are merged by score into one global top-k. Each shard
+# stays small, so query latency stays flat as more documents are added.
+import os
+import re
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from langchain_chroma import Chroma
+from mmap_vector_store import MmapVectorStore
+
+SHARD_SEARCH_WORKERS = int(os.getenv("RAG_SHARD_SEARCH_WORKERS", "8"))
+VECTOR_BACKEND = os.getenv("RAG_VECTOR_BACKEND", "chroma")  # "chroma" or "mmap"
+MMAP_DTYPE = os.getenv("RAG_MMAP_DTYPE", "float32")  # "float32", "float16" or "int8"
+
+
+def shard_name(pdf_path: str) -> str:
+    """Shard (and Chroma collection) name for a document: its file name, made collection-safe."""
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    name = re.sub(r"[^a-zA-Z0-9._-]+", "-", stem).strip("-._")
+    return (name or "shard")[:63].ljust(3, "_")  # Chroma names are 3-63 chars
+
+
+class ShardedRetriever:
+    def __init__(self, embeddings, persist_directory: str, max_workers: int = SHARD_SEARCH_WORKERS,
+                 backend: str = VECTOR_BACKEND, mmap_dtype: str = MMAP_DTYPE):
+        if backend not in ("chroma", "mmap"):
+            raise ValueError(f"Unknown vector backend: {backend}")
+        self.embeddings = embeddings
+        self.persist_directory = persist_directory
+        self.backend = backend
+        self.mmap_dtype = mmap_dtype
+        self.shards: Dict[str, object] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shard-search")
+
+    def add_shard(self, name: str):
+        """Open (or create) the collection backing shard `name` and return its vector store."""
+        if name not in self.shards and self.backend == "mmap":
+            self.shards[name] = MmapVectorStore(
+                self.embeddings, self.persist_directory, name, dtype=self.mmap_dtype
+            )
+        elif name not in self.shards:
+            self.shards[name] = Chroma(
+                collection_name=name,
+                embedding_function=self.embeddings,
+                persist_directory=self.persist_directory,
+            )
+        return self.shards[name]
+
+    def manifest_path(self, name: str) -> str:
+        """Manifest file of shard `name` (see rag_index.sync_pdfs); each backend and mmap dtype has its own."""
+        store = f"mmap-{self.mmap_dtype}" if self.backend == "mmap" else self.backend
+        return os.path.join(self.persist_directory, f"{name}.{store}.manifest.json")
+
+    def select(self, shards: Optional[List[str]] = None) -> List[str]:
+        """Shard names to search: all of them when `shards` is None, else the known ones among `shards`."""
+        if shards is None:
+            return list(self.shards)
+        return [name for name in shards if name in self.shards]
+
+    def search(self, query: str, k: int = 5, shards: Optional[List[str]] = None) -> list:
+        """Global top-k documents for `query` across the selected shards (best first)."""
+        names = self.select(shards)
+        if not names:
+            return []
+        vector = self.embeddings.embed_query(query)  # embed once, not once per shard
+
+        def search_shard(name):
+            hits = self.shards[name].similarity_search_by_vector_with_relevance_scores(vector, k=k)
+            for doc, _ in hits:
+                doc.metadata["shard"] = name
+            return hits
+
+        all_hits = [hit for hits in self._pool.map(search_shard, names) for hit in hits]
+        # Both backends return squared L2 distances (lower is closer) from one embedding model
+        return [doc for doc, _ in heapq.nsmallest(k, all_hits, key=lambda hit: hit[1])]
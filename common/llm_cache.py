@@ -0,0 +1,136 @@
+# llm_cache.py
+# Opt-in, persistent LLM response cache shared by the LangChain / LangGraph entry points.
+#
+# Enable it by pointing LLM_CACHE_PATH at a SQLite file (e.g. in .env):
+#   LLM_CACHE_PATH=.llm_cache.sqlite
+#   LLM_CACHE_TTL=604800          # seconds, 0 = never expire
+#   LLM_CACHE_MAX_ENTRIES=10000   # least recently used entries are evicted past this
+#
+# Every ChatOpenAI call whose model, parameters and messages were seen before
+# is then answered from disk without a network round-trip.
+import os
+import time
+import sqlite3
+import threading
+from typing import Optional
+
+import xxhash
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.globals import set_llm_cache
+from langchain_core.load import dumps, loads
+
+
+class SQLiteLLMCache(BaseCache):
+    """SQLite-backed LangChain cache with TTL, LRU eviction and hit/miss counters.
+
+    Entries are keyed by an xxhash of the LLM string (model + parameters, as
+    serialized by LangChain) and the prompt (the serialized messages).
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 0, max_entries: int = 0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str, llm_string: str) -> str:
+        return xxhash.xxh3_128_hexdigest(f"{llm_string}\x00{prompt}")
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        key = self.make_key(prompt, llm_string)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return loads(row[0])
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        key = self.make_key(prompt, llm_string)
+        value = dumps(list(return_val))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the least recently used ones beyond max_entries."""
+        if self.ttl_seconds:
+            self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        if self.max_entries:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    " SELECT key FROM llm_cache ORDER BY accessed_at ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+        }
+
+
+def enable_llm_cache(
+    path: Optional[str] = None,
+    ttl_seconds: Optional[float] = None,
+    max_entries: Optional[int] = None,
+) -> Optional[SQLiteLLMCache]:
+    """Install the SQLite cache as LangChain's global LLM cache.
+
+    Arguments default to the LLM_CACHE_* environment variables. Does nothing
+    and returns None when no cache path is configured, so calling it from an
+    entry point keeps the cache opt-in.
+    """
+    path = path or os.getenv("LLM_CACHE_PATH")
+    if not path:
+        return None
+    if ttl_seconds is None:
+        ttl_seconds = float(os.getenv("LLM_CACHE_TTL", "604800"))
+    if max_entries is None:
+        max_entries = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+    cache = SQLiteLLMCache(path, ttl_seconds=ttl_seconds, max_entries=max_entries)
+    set_llm_cache(cache)
+    return cache
@@ -5,12 +5,20 @@ st.title("Pet Name and Story Generator")
 
 animal_type = st.text_input("Enter the type of animal (e.g., unicorn, dragon):")
 animal_colour = st.text_input("Enter the colour of the animal (e.g., green, blue):")
+mode = st.radio(
+    "Generation mode:",
+    ["chain", "structured"],
+    format_func=lambda m: "Step by step (3 calls)" if m == "chain" else "Single structured call (faster)",
+    horizontal=True,
+)
 if st.button("Generate Pet Info"):
     if animal_type and animal_colour:
-        result = lch.generate_pet_info(animal_type, animal_colour)
+        stats = {}
+        result = lch.generate_pet_info(animal_type, animal_colour, mode=mode, stats=stats)
         st.write(f"🐾 **Pet Name:** {result['pet_name']}")
         st.write(f"📖 **Backstory:** {result['pet_story']}")
         st.write(f"🇪🇸 **Spanish Translation:** {result['pet_story_spanish']}")
+        st.caption(f"{stats['latency_s']:.2f}s · {stats['llm_calls']} LLM call(s) · {stats['total_tokens']} tokens")
     else:
         st.error("Please enter both animal type and colour.")
 else:
@@ -2,12 +2,27 @@ from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 from langchain.schema import StrOutputParser
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough
+from langchain_community.callbacks import get_openai_callback
+from pydantic import BaseModel, Field, ValidationError
+import os
+import time
+import sys
+import csv
+import json
+import argparse
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.llm_cache import enable_llm_cache
 
 load_dotenv()
+llm_cache = enable_llm_cache()
 
 # LLM setup
 llm = ChatOpenAI(temperature=0.7, model="gpt-4o-mini")
 
+PET_MAX_CONCURRENCY = int(os.getenv("PET_MAX_CONCURRENCY", "16"))  # animals generated at once in batch mode
+
 # Step 1 → Pet Name Generator
 name_prompt = PromptTemplate(
     input_variables=["animal_type", "animal_colour"],
@@ -30,35 +45,156 @@ translate_prompt = PromptTemplate(
 # Output parser to get plain string instead of AIMessage
 parser = StrOutputParser()
 
-# Build step-by-step chain
-def generate_pet_info(animal_type, animal_colour):
-    # Step 1 → get pet name
-    pet_name = (name_prompt | llm | parser).invoke({
-        "animal_type": animal_type,
-        "animal_colour": animal_colour
-    }).strip()
-
-    # Step 2 → get backstory
-    pet_story = (story_prompt | llm | parser).invoke({
-        "pet_name": pet_name,
-        "animal_type": animal_type,
-        "animal_colour": animal_colour
-    }).strip()
-
-    # Step 3 → translate
-    pet_story_es = (translate_prompt | llm | parser).invoke({
-        "pet_story": pet_story
-    }).strip()
-
-    return {
-        "pet_name": pet_name,
-        "pet_story": pet_story,
-        "pet_story_spanish": pet_story_es
-    }
+# Build the chains once; every call (and every batch item) reuses them
+strip = RunnableLambda(str.strip)
+name_chain = name_prompt | llm | parser | strip
+story_chain = story_prompt | llm | parser | strip
+translate_chain = translate_prompt | llm | parser | strip
+
+# Step-by-step chain: each step adds its output to the inputs of the next,
+# so name -> backstory -> translation stays sequential within one animal
+pet_info_chain = (
+    RunnablePassthrough.assign(pet_name=name_chain)
+    | RunnablePassthrough.assign(pet_story=story_chain)
+    | RunnablePassthrough.assign(pet_story_spanish=translate_chain)
+    | RunnableLambda(lambda x: {
+        "pet_name": x["pet_name"],
+        "pet_story": x["pet_story"],
+        "pet_story_spanish": x["pet_story_spanish"]
+    })
+)
+
+
+# Single-call alternative → all three fields from one structured-output request
+class PetInfo(BaseModel):
+    """Name, backstory and Spanish translation for one pet."""
+    pet_name: str = Field(description="A unique and creative name for the pet")
+    pet_story: str = Field(description="A short and fun backstory for the pet, using its name")
+    pet_story_spanish: str = Field(description="The backstory translated into Spanish")
+
+
+structured_prompt = PromptTemplate(
+    input_variables=["animal_type", "animal_colour"],
+    template="Generate a unique and creative name for a {animal_colour} {animal_type}, "
+             "write a short and fun backstory for the pet using that name, "
+             "and translate the backstory into Spanish."
+)
+
+
+def _parsed_pet_info(output):
+    # include_raw=True reports schema violations instead of raising; raise so the fallback runs
+    if output["parsed"] is None:
+        raise ValueError(f"Structured output failed validation: {output['parsing_error']}")
+    return output["parsed"].model_dump()
+
+
+# Falls back to the three-step chain only if the single call's output does not match PetInfo;
+# API errors (rate limits, timeouts, auth) are raised, not retried three more times
+structured_pet_info_chain = (
+    structured_prompt | llm.with_structured_output(PetInfo, include_raw=True) | RunnableLambda(_parsed_pet_info)
+).with_fallbacks([pet_info_chain], exceptions_to_handle=(ValueError, ValidationError))
+
+pet_info_chains = {
+    "chain": pet_info_chain,  # three sequential calls
+    "structured": structured_pet_info_chain,  # one call
+}
+
+
+def generate_pet_info(animal_type, animal_colour, mode="chain", stats=None):
+    """Generate name, backstory and Spanish translation; `mode` is "chain" or "structured".
+
+    If a `stats` dict is given it is filled with latency and OpenAI token usage,
+    so both modes can be compared on the same inputs.
+    """
+    start = time.perf_counter()
+    with get_openai_callback() as usage:
+        result = pet_info_chains[mode].invoke({
+            "animal_type": animal_type,
+            "animal_colour": animal_colour
+        })
+    if stats is not None:
+        stats.update({
+            "mode": mode,
+            "latency_s": round(time.perf_counter() - start, 3),
+            "llm_calls": usage.successful_requests,  # 4 in structured mode means it fell back
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens,
+        })
+    return result
+
+
+def generate_pet_info_batch(pairs, max_concurrency=PET_MAX_CONCURRENCY, mode="chain"):
+    """Yield (index, result) for each (animal_type, animal_colour) pair as soon as it finishes.
+
+    Up to `max_concurrency` animals are in flight at once. A failed item
+    yields (index, exception) and does not affect the others.
+    """
+    inputs = [{"animal_type": animal_type, "animal_colour": animal_colour} for animal_type, animal_colour in pairs]
+    yield from pet_info_chains[mode].batch_as_completed(
+        inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True
+    )
+
+
+async def agenerate_pet_info_batch(pairs, max_concurrency=PET_MAX_CONCURRENCY, mode="chain"):
+    """Async version of generate_pet_info_batch()."""
+    inputs = [{"animal_type": animal_type, "animal_colour": animal_colour} for animal_type, animal_colour in pairs]
+    async for index, result in pet_info_chains[mode].abatch_as_completed(
+        inputs, config={"max_concurrency": max_concurrency}, return_exceptions=True
+    ):
+        yield index, result
+
+
+def read_pairs(path):
+    """(animal_type, animal_colour) pairs from a CSV file with one pair per line ('-' for stdin)."""
+    f = sys.stdin if path == "-" else open(path, newline="")
+    try:
+        return [(row[0].strip(), row[1].strip()) for row in csv.reader(f) if len(row) >= 2 and row[0].strip()]
+    finally:
+        if f is not sys.stdin:
+            f.close()
 
 
 if __name__ == "__main__":
-    result = generate_pet_info("unicorn", "green")
+    arg_parser = argparse.ArgumentParser(description="Pet name, backstory and Spanish translation generator")
+    arg_parser.add_argument("--batch", metavar="PATH",
+                            help="CSV file of animal_type,animal_colour pairs ('-' for stdin); "
+                                 "results are written as JSONL in completion order")
+    arg_parser.add_argument("--concurrency", type=int, default=PET_MAX_CONCURRENCY,
+                            help="max animals generated at once in batch mode")
+    arg_parser.add_argument("--mode", choices=sorted(pet_info_chains), default="chain",
+                            help="three sequential calls (chain) or one structured-output call (structured)")
+    arg_parser.add_argument("--compare", action="store_true",
+                            help="run both modes on the same animal and print latency and token usage")
+    args = arg_parser.parse_args()
+
+    if args.compare:
+        # Unset LLM_CACHE_PATH for this, or cached responses hide the real latency and tokens
+        for mode in pet_info_chains:
+            stats = {}
+            generate_pet_info("unicorn", "green", mode=mode, stats=stats)
+            print(json.dumps(stats))
+        sys.exit(0)
+
+    if args.batch:
+        pairs = read_pairs(args.batch)
+        failed = 0
+        for index, result in generate_pet_info_batch(pairs, max_concurrency=args.concurrency, mode=args.mode):
+            record = {"index": index, "animal_type": pairs[index][0], "animal_colour": pairs[index][1]}
+            if isinstance(result, Exception):
+                failed += 1
+                record["error"] = f"{type(result).__name__}: {result}"
+            else:
+                record.update(result)
+            print(json.dumps(record, ensure_ascii=False), flush=True)
+        print(f"{len(pairs) - failed} succeeded, {failed} failed", file=sys.stderr)
+        sys.exit(0)
+
+    stats = {}
+    result = generate_pet_info("unicorn", "green", mode=args.mode, stats=stats)
     print("Pet Name:", result["pet_name"])
     print("\nBackstory:", result["pet_story"])
     print("\nSpanish Translation:", result["pet_story_spanish"])
+    print("\nStats:", stats)
+    if llm_cache:
+        print("\nLLM cache:", llm_cache.stats())
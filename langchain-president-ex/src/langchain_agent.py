@@ -1,24 +1,33 @@
 from dotenv import load_dotenv
-from langchain_community.agent_toolkits.load_tools import load_tools
 from langchain.agents import initialize_agent, AgentType
 from langchain_openai import ChatOpenAI
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.llm_cache import enable_llm_cache
+from wikipedia_cache import WikipediaCache
+from math_tool import calculator_tool
 
 load_dotenv()
+llm_cache = enable_llm_cache()
 
 # LLM setup
 llm = ChatOpenAI(temperature=0.7, model="gpt-4o-mini") 
 
-def langchain_agent():
-    tools = load_tools(["wikipedia", "llm-math"], llm=llm)
-
-    # Updated AgentType
-    agent = initialize_agent(
-        tools=tools,
-        llm=llm,
-        agent_type=AgentType.OPENAI_FUNCTIONS,  # Still works but flagged for LangGraph migration
-        verbose=True
-    )
+# Tools and agent are built once and reused by every call
+wikipedia_cache = WikipediaCache()  # on-disk cache; WIKIPEDIA_FIXTURES_DIR runs it offline
+# Calculator replaces llm-math: plain expressions are evaluated locally, without an LLM round-trip
+tools = [wikipedia_cache.as_tool(), calculator_tool(llm)]
 
+# Updated AgentType
+agent = initialize_agent(
+    tools=tools,
+    llm=llm,
+    agent_type=AgentType.OPENAI_FUNCTIONS,  # Still works but flagged for LangGraph migration
+    verbose=True
+)
+
+def langchain_agent():
     query = (
         "Retrieve the complete list of all Presidents of the United States from the most reliable sources.  "
         "For each president, include:"
@@ -34,4 +43,9 @@ def langchain_agent():
 
 
 if __name__ == "__main__":
-    langchain_agent()
\ No newline at end of file
+    # Warm the cache for the page the query depends on most; further lookups happen during the run
+    wikipedia_cache.prefetch(["List of presidents of the United States"])
+    langchain_agent()
+    print(f"Wikipedia cache: {wikipedia_cache.stats()}")
+    if llm_cache:
+        print(f"LLM cache: {llm_cache.stats()}")
\ No newline at end of file
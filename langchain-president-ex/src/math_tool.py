@@ -0,0 +1,92 @@
+# math_tool.py
+# Drop-in replacement for load_tools(["llm-math"]).
+#
+# llm-math sends every input to the LLM to turn it into an expression before
+# evaluating it with numexpr. Agents almost always pass a plain expression
+# already ("2024 - 1789", "(1801 - 1797) * 2"), so this tool parses the input
+# locally, checks it against a whitelist of arithmetic nodes and evaluates it
+# with numexpr directly; only input that is not an expression goes to the LLM.
+import ast
+import math
+from functools import lru_cache
+from typing import Optional
+
+import numexpr
+from langchain.chains import LLMMathChain
+from langchain_core.tools import Tool
+
+ALLOWED_FUNCTIONS = {
+    "sin", "cos", "tan", "arcsin", "arccos", "arctan", "arctan2", "sinh", "cosh", "tanh",
+    "exp", "expm1", "log", "log10", "log1p", "sqrt", "abs",
+}
+ALLOWED_NAMES = {"pi": math.pi, "e": math.e}
+ALLOWED_OPERATORS = (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.Mod, ast.USub, ast.UAdd)
+
+
+class _FloatLiterals(ast.NodeTransformer):
+    # numexpr evaluates integer literals as int64, which silently overflows (e.g. 2**100)
+    def visit_Constant(self, node):
+        return ast.copy_location(ast.Constant(float(node.value)), node)
+
+
+def _is_safe(node) -> bool:
+    if isinstance(node, ast.Expression):
+        return _is_safe(node.body)
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, (int, float)) and not isinstance(node.value, bool)
+    if isinstance(node, ast.Name):
+        return node.id in ALLOWED_NAMES
+    if isinstance(node, ast.BinOp):
+        return isinstance(node.op, ALLOWED_OPERATORS) and _is_safe(node.left) and _is_safe(node.right)
+    if isinstance(node, ast.UnaryOp):
+        return isinstance(node.op, ALLOWED_OPERATORS) and _is_safe(node.operand)
+    if isinstance(node, ast.Call):
+        return (isinstance(node.func, ast.Name) and node.func.id in ALLOWED_FUNCTIONS and not node.keywords
+                and all(_is_safe(arg) for arg in node.args))
+    return False
+
+
+def parse_expression(text: str) -> Optional[str]:
+    """The input as a numexpr expression if it is plain arithmetic, else None."""
+    text = text.strip().rstrip(" =?").replace("^", "**")
+    try:
+        tree = ast.parse(text, mode="eval")
+    except (SyntaxError, ValueError):
+        return None
+    if not _is_safe(tree):
+        return None
+    try:
+        return ast.unparse(_FloatLiterals().visit(tree))
+    except OverflowError:  # an integer literal too large for a float; leave it to the LLM
+        return None
+
+
+@lru_cache(maxsize=1024)
+def evaluate_expression(expression: str) -> str:
+    value = float(numexpr.evaluate(expression, global_dict={}, local_dict=ALLOWED_NAMES))
+    if value.is_integer() and abs(value) < 2 ** 53:
+        return str(int(value))  # "235", not "235.0", for year and term arithmetic
+    return str(value)
+
+
+def calculator_tool(llm) -> Tool:
+    """A "Calculator" tool like llm-math's, answering plain expressions without an LLM call."""
+    llm_math = None
+
+    def calculate(text: str) -> str:
+        nonlocal llm_math
+        expression = parse_expression(text)
+        if expression is not None:
+            try:
+                return f"Answer: {evaluate_expression(expression)}"
+            except Exception:  # e.g. wrong number of arguments for a function; let the LLM sort it out
+                pass
+        if llm_math is None:
+            llm_math = LLMMathChain.from_llm(llm=llm)
+        return llm_math.run(text)
+
+    return Tool(
+        name="Calculator",
+        func=calculate,
+        description="Useful for when you need to answer questions about math.",
+    )
@@ -0,0 +1,145 @@
+# wikipedia_cache.py
+# Wikipedia lookups for the agent, cached on disk.
+#
+# Search results and pages (title, summary, content, url) are stored in a
+# SQLite file and reused until they are older than the TTL:
+#   WIKIPEDIA_CACHE_PATH=.wikipedia_cache.sqlite
+#   WIKIPEDIA_CACHE_TTL=604800     # seconds, 0 = never expire
+#
+# WIKIPEDIA_FIXTURES_DIR replaces the live API with a directory of page
+# files (one <title>.json per page with "title", "summary" and optionally
+# "content" and "url"), for offline runs and repeatable tests.
+import os
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional
+
+import wikipedia
+from langchain_core.tools import Tool
+
+WIKIPEDIA_CACHE_PATH = os.getenv("WIKIPEDIA_CACHE_PATH", ".wikipedia_cache.sqlite")
+WIKIPEDIA_CACHE_TTL = float(os.getenv("WIKIPEDIA_CACHE_TTL", "604800"))
+WIKIPEDIA_FIXTURES_DIR = os.getenv("WIKIPEDIA_FIXTURES_DIR")
+PREFETCH_WORKERS = int(os.getenv("WIKIPEDIA_PREFETCH_WORKERS", "8"))
+
+
+class WikipediaCache:
+    """Same output as LangChain's WikipediaAPIWrapper.run(), with cached searches and pages."""
+
+    def __init__(self, path: str = WIKIPEDIA_CACHE_PATH, ttl_seconds: float = WIKIPEDIA_CACHE_TTL,
+                 fixtures_dir: Optional[str] = WIKIPEDIA_FIXTURES_DIR, lang: str = "en",
+                 top_k_results: int = 3, doc_content_chars_max: int = 4000,
+                 max_workers: int = PREFETCH_WORKERS):
+        self.ttl_seconds = ttl_seconds
+        self.fixtures_dir = fixtures_dir
+        self.lang = lang
+        self.top_k_results = top_k_results
+        self.doc_content_chars_max = doc_content_chars_max
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wikipedia")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS wikipedia_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        wikipedia.set_lang(lang)
+
+    # ---------------- cache ----------------
+    def _cached(self, key: str, fetch):
+        """Value stored under `key` if still fresh, else fetch(), store it and return it."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, fetched_at FROM wikipedia_cache WHERE key = ?", (key,)
+            ).fetchone()
+            fresh = row is not None and (not self.ttl_seconds or now - row[1] <= self.ttl_seconds)
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if fresh:
+            return json.loads(row[0])
+        value = fetch()  # outside the lock, so prefetch() fetches pages in parallel
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO wikipedia_cache (key, value, fetched_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now),
+            )
+            self._conn.commit()
+        return value
+
+    # ---------------- sources ----------------
+    def _fixture_pages(self) -> List[dict]:
+        pages = []
+        for name in sorted(os.listdir(self.fixtures_dir)):
+            if name.endswith(".json"):
+                with open(os.path.join(self.fixtures_dir, name), encoding="utf-8") as f:
+                    pages.append(json.load(f))
+        return pages
+
+    def _fetch_search(self, query: str) -> List[str]:
+        if self.fixtures_dir:
+            # Rank fixture titles by how many query words they contain
+            words = set(query.lower().split())
+            scored = [(len(words & set(page["title"].lower().split())), page["title"])
+                      for page in self._fixture_pages()]
+            return [title for score, title in sorted(scored, key=lambda s: -s[0]) if score][:self.top_k_results]
+        return wikipedia.search(query[:300], results=self.top_k_results)  # 300: API query length limit
+
+    def _fetch_page(self, title: str) -> Optional[dict]:
+        if self.fixtures_dir:
+            return next((page for page in self._fixture_pages() if page["title"] == title), None)
+        try:
+            page = wikipedia.page(title=title, auto_suggest=False)
+        except (wikipedia.exceptions.PageError, wikipedia.exceptions.DisambiguationError):
+            return None  # cached too, so a missing page is not requested again until the TTL runs out
+        return {"title": page.title, "summary": page.summary, "content": page.content, "url": page.url}
+
+    # ---------------- public API ----------------
+    def search(self, query: str) -> List[str]:
+        return self._cached(f"search:{self.lang}:{self.top_k_results}:{query}", lambda: self._fetch_search(query))
+
+    def page(self, title: str) -> Optional[dict]:
+        return self._cached(f"page:{self.lang}:{title}", lambda: self._fetch_page(title))
+
+    def prefetch(self, titles: Iterable[str]) -> dict:
+        """Load many pages into the cache concurrently (fresh entries are kept); returns {title: found}."""
+        titles = list(dict.fromkeys(titles))
+        pages = list(self._pool.map(self.page, titles))
+        return {title: page is not None for title, page in zip(titles, pages)}
+
+    def run(self, query: str) -> str:
+        titles = self.search(query)
+        summaries = []
+        for title, page in zip(titles, self._pool.map(self.page, titles)):  # result pages load in parallel
+            if page and page.get("summary"):
+                summaries.append(f"Page: {title}\nSummary: {page['summary']}")
+        if not summaries:
+            return "No good Wikipedia Search Result was found"
+        return "\n\n".join(summaries)[:self.doc_content_chars_max]
+
+    def as_tool(self) -> Tool:
+        # Same name and description as load_tools(["wikipedia"]), so prompts work unchanged
+        return Tool(
+            name="wikipedia",
+            func=self.run,
+            description=(
+                "A wrapper around Wikipedia. Useful for when you need to answer general questions about "
+                "people, places, companies, facts, historical events, or other subjects. "
+                "Input should be a search query."
+            ),
+        )
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
@@ -0,0 +1,248 @@
+# corpus_index.py
+# One persistent, approximate FAISS index over many videos (a channel, a playlist, ...).
+#
+#   corpus.faiss    raw faiss index; vector i is chunk row i (ids are sequential)
+#   corpus.sqlite   row -> video id, chunk text and metadata; one row per indexed video
+#
+# HNSW (default) grows incrementally from the first video. IVF answers
+# exactly from a flat index until it has IVF_NLIST * 39 vectors, then
+# trains its coarse quantizer on them and switches over. Either way query
+# time grows sub-linearly with the corpus; YT_HNSW_EF_SEARCH / YT_IVF_NPROBE
+# trade recall for speed. Searches can be restricted to some videos: large
+# selections filter inside the ANN search, small ones are answered exactly.
+#
+#   python corpus_index.py add <url or id> [...]
+#   python corpus_index.py ask "question" [--video <id> ...]
+import os
+import json
+import sqlite3
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from lang_index_own_data_agent import (
+    embeddings,
+    EMBED_BATCH_SIZE,
+    load_transcript_chunks,
+    normalize_video_id,
+    get_response_for_docs,
+)
+
+CORPUS_DIR = os.getenv("YT_CORPUS_DIR", "faiss_corpus")
+CORPUS_INDEX_TYPE = os.getenv("YT_CORPUS_INDEX", "hnsw")  # "hnsw" or "ivf", fixed when the corpus is created
+HNSW_M = int(os.getenv("YT_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("YT_HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("YT_HNSW_EF_SEARCH", "64"))
+IVF_NLIST = int(os.getenv("YT_IVF_NLIST", "1024"))
+IVF_NPROBE = int(os.getenv("YT_IVF_NPROBE", "16"))
+EXACT_FILTER_ROWS = int(os.getenv("YT_EXACT_FILTER_ROWS", "20000"))  # video filters this small are searched exactly
+LOAD_WORKERS = int(os.getenv("YT_CORPUS_LOAD_WORKERS", "8"))  # transcripts downloaded in parallel
+
+
+class CorpusIndex:
+    def __init__(self, directory: str = CORPUS_DIR, index_type: str = CORPUS_INDEX_TYPE):
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, "corpus.faiss")
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(os.path.join(directory, "corpus.sqlite"), check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " row INTEGER PRIMARY KEY, video_id TEXT NOT NULL, text TEXT, metadata TEXT);"
+            "CREATE INDEX IF NOT EXISTS chunks_video ON chunks (video_id);"
+            "CREATE TABLE IF NOT EXISTS videos (video_id TEXT PRIMARY KEY, chunks INTEGER, added_at REAL);"
+            "CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT);"
+        )
+        stored = dict(self._conn.execute("SELECT key, value FROM settings").fetchall())
+        self.index_type = stored.get("index_type", index_type)
+        if self.index_type not in ("hnsw", "ivf"):
+            raise ValueError(f"Unknown corpus index type: {self.index_type}")
+        self._conn.execute("INSERT OR REPLACE INTO settings VALUES ('index_type', ?)", (self.index_type,))
+        self._conn.commit()
+        self.index = faiss.read_index(self.index_path) if os.path.exists(self.index_path) else None
+        self._drop_unsaved_videos()
+
+    def _drop_unsaved_videos(self):
+        """Forget videos whose vectors did not reach the saved index (crash before save()); they can be re-added."""
+        ntotal = self.index.ntotal if self.index is not None else 0
+        lost = [video_id for (video_id,) in self._conn.execute(
+            "SELECT DISTINCT video_id FROM chunks WHERE row >= ?", (ntotal,))]
+        for video_id in lost:
+            self._conn.execute("DELETE FROM chunks WHERE video_id = ?", (video_id,))
+            self._conn.execute("DELETE FROM videos WHERE video_id = ?", (video_id,))
+        self._conn.commit()
+
+    # ---------------- building ----------------
+    def _new_index(self, dim: int):
+        if self.index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            return index
+        return faiss.IndexFlatIP(dim)  # until there is enough data to train IVF
+
+    def _maybe_train_ivf(self):
+        """Replace the warm-up flat index with a trained IVF index once it holds enough vectors."""
+        if self.index_type != "ivf" or not isinstance(self.index, faiss.IndexFlat):
+            return
+        if self.index.ntotal < IVF_NLIST * 39:  # faiss warns below 39 training points per centroid
+            return
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        ivf = faiss.IndexIVFFlat(faiss.IndexFlatIP(self.index.d), self.index.d, IVF_NLIST, faiss.METRIC_INNER_PRODUCT)
+        ivf.train(vectors)
+        ivf.add(vectors)  # same order, so row ids stay the same
+        self.index = ivf
+
+    def save(self):
+        with self._lock:
+            if self.index is None:
+                return
+            tmp_path = self.index_path + ".tmp"
+            faiss.write_index(self.index, tmp_path)
+            os.replace(tmp_path, self.index_path)  # atomic, so a crash never leaves a half-written index
+
+    def has_video(self, video_id: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM videos WHERE video_id = ?", (video_id,)).fetchone() is not None
+
+    def add_chunks(self, video_id: str, chunks: List[Document], vectors, save: bool = True) -> int:
+        """Append one video's embedded chunks; returns the number of chunks added (0 if already indexed)."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        faiss.normalize_L2(vectors)  # inner product == cosine similarity
+        with self._lock:
+            if self.has_video(video_id) or len(chunks) == 0:
+                return 0
+            if self.index is None:
+                self.index = self._new_index(vectors.shape[1])
+            first_row = self.index.ntotal
+            self.index.add(vectors)
+            self._maybe_train_ivf()
+            # New rows always start at index.ntotal: vectors without metadata are skipped by search,
+            # and metadata without saved vectors is dropped on the next open, so ids never misalign
+            if save:
+                self.save()
+            self._conn.executemany(
+                "INSERT INTO chunks (row, video_id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(first_row + i, video_id, doc.page_content, json.dumps(doc.metadata))
+                 for i, doc in enumerate(chunks)],
+            )
+            self._conn.execute("INSERT INTO videos VALUES (?, ?, ?)", (video_id, len(chunks), time.time()))
+            self._conn.commit()
+        return len(chunks)
+
+    def _embed_video(self, video_id: str):
+        chunks = load_transcript_chunks(f"https://www.youtube.com/watch?v={video_id}")
+        texts = [doc.page_content for doc in chunks]
+        vectors = []
+        for start in range(0, len(texts), EMBED_BATCH_SIZE):
+            vectors.extend(embeddings.embed_documents(texts[start:start + EMBED_BATCH_SIZE]))
+        return chunks, vectors
+
+    def add_videos(self, video_urls, max_workers: int = LOAD_WORKERS) -> dict:
+        """Download, embed and add the videos not indexed yet; returns {video id: chunks added or error}."""
+        video_ids = list(dict.fromkeys(normalize_video_id(url) for url in video_urls))
+        todo = [video_id for video_id in video_ids if not self.has_video(video_id)]
+        added = {video_id: 0 for video_id in video_ids}
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="corpus-load") as pool:
+            futures = {video_id: pool.submit(self._embed_video, video_id) for video_id in todo}
+            for video_id, future in futures.items():
+                try:
+                    added[video_id] = self.add_chunks(video_id, *future.result(), save=False)
+                except Exception as e:  # e.g. no transcript; the other videos are still added
+                    added[video_id] = f"error: {e}"
+        self.save()
+        return added
+
+    # ---------------- search ----------------
+    def _search_params(self, k: int, selector=None):
+        if isinstance(self.index, faiss.IndexHNSW):
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=max(HNSW_EF_SEARCH, k))
+        if isinstance(self.index, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=IVF_NPROBE)
+        return faiss.SearchParameters(sel=selector) if selector is not None else None
+
+    def _search_exact(self, query: np.ndarray, rows: np.ndarray, k: int):
+        if isinstance(self.index, faiss.IndexIVF):
+            self.index.make_direct_map()  # lets reconstruct() find a row's vector; kept up to date by add()
+        vectors = self.index.reconstruct_batch(rows)
+        scores = vectors @ query[0]
+        top = np.argsort(-scores)[:k]
+        return scores[top], rows[top]
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     video_ids: Optional[List[str]] = None) -> List[tuple]:
+        """Top-k (Document, cosine similarity) pairs, optionally only from the given videos."""
+        if video_ids is not None and not video_ids:
+            return []  # an empty filter matches nothing (and "IN ()" is not valid SQL)
+        query_vector = np.asarray([embeddings.embed_query(query)], dtype=np.float32)
+        faiss.normalize_L2(query_vector)
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                return []
+            if video_ids is None:
+                scores, rows = self.index.search(query_vector, k, params=self._search_params(k))
+                scores, rows = scores[0], rows[0]
+            else:
+                placeholders = ",".join("?" * len(video_ids))
+                selected = np.fromiter(
+                    (row for (row,) in self._conn.execute(
+                        f"SELECT row FROM chunks WHERE video_id IN ({placeholders})", list(video_ids))),
+                    dtype=np.int64,
+                )
+                if len(selected) == 0:
+                    return []
+                if len(selected) <= EXACT_FILTER_ROWS:
+                    # Few candidates: brute force is exact and cheaper than a heavily filtered graph walk
+                    scores, rows = self._search_exact(query_vector, selected, k)
+                else:
+                    selector = faiss.IDSelectorBatch(selected.size, faiss.swig_ptr(selected))
+                    scores, rows = self.index.search(query_vector, k, params=self._search_params(k, selector))
+                    scores, rows = scores[0], rows[0]
+            hits = [(int(row), float(score)) for row, score in zip(rows, scores) if row >= 0]
+            if not hits:
+                return []
+            placeholders = ",".join("?" * len(hits))
+            found = {row: (video_id, text, meta) for row, video_id, text, meta in self._conn.execute(
+                f"SELECT row, video_id, text, metadata FROM chunks WHERE row IN ({placeholders})",
+                [row for row, _ in hits])}
+        results = []
+        for row, score in hits:
+            if row in found:
+                video_id, text, meta = found[row]
+                results.append((Document(page_content=text, metadata={**json.loads(meta), "video_id": video_id}), score))
+        return results
+
+    def similarity_search(self, query: str, k: int = 4, video_ids: Optional[List[str]] = None) -> List[Document]:
+        # Same signature as the FAISS store, so it can be passed to get_response_for_query
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, video_ids)]
+
+    def stats(self) -> dict:
+        videos, chunks = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(chunks), 0) FROM videos").fetchone()
+        return {
+            "index_type": self.index_type,
+            "faiss_index": type(self.index).__name__ if self.index is not None else None,
+            "videos": videos,
+            "chunks": chunks,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-video YouTube corpus index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add_parser = commands.add_parser("add", help="index one or more videos")
+    add_parser.add_argument("videos", nargs="+", help="video URLs or IDs")
+    ask_parser = commands.add_parser("ask", help="answer a question from the corpus")
+    ask_parser.add_argument("question")
+    ask_parser.add_argument("--video", action="append", help="only search these videos (repeatable)")
+    ask_parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = CorpusIndex()
+    if args.command == "add":
+        print(corpus.add_videos(args.videos))
+        print(corpus.stats())
+    else:
+        video_ids = [normalize_video_id(video) for video in args.video] if args.video else None
+        docs = corpus.similarity_search(args.question, k=args.k, video_ids=video_ids)
+        print(get_response_for_docs(args.question, docs))
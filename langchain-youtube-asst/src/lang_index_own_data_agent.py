@@ -5,52 +5,135 @@ from langchain.prompts import PromptTemplate
 from langchain_community.vectorstores import FAISS
 from langchain_openai import OpenAIEmbeddings
 from dotenv import load_dotenv
+import numpy as np
+import os
+import sys
+import shutil
+import time
+import uuid
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from common.llm_cache import enable_llm_cache
 
 load_dotenv()
+llm_cache = enable_llm_cache()
 
 embeddings = OpenAIEmbeddings()
 
 llm = ChatOpenAI(temperature=0.7, model="gpt-4o-mini")  # Use latest model
 
-def create_vector_store_from_youtube(video_url):
+# One saved FAISS index per video (and embedding model), least recently used evicted first
+INDEX_CACHE_DIR = os.getenv("YT_INDEX_CACHE_DIR", "faiss_index_cache")
+INDEX_CACHE_MAX_VIDEOS = int(os.getenv("YT_INDEX_CACHE_MAX_VIDEOS", "50"))
+EMBED_BATCH_SIZE = int(os.getenv("YT_EMBED_BATCH_SIZE", "64"))  # chunks per embedding request
+LLM_MAX_CONCURRENCY = int(os.getenv("YT_LLM_MAX_CONCURRENCY", "8"))  # LLM calls in flight for batch QA
+
+def load_transcript_chunks(video_url):
     # Load the YouTube video
     loader = YoutubeLoader.from_youtube_url(video_url, add_video_info=False)
     documents = loader.load()
 
     # Split the documents into manageable chunks
     text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    split_docs = text_splitter.split_documents(documents)
+    return text_splitter.split_documents(documents)
+
+
+def create_vector_store_from_youtube(video_url, on_progress=None):
+    # on_progress(stage, fraction) is called as indexing advances, e.g. to drive a progress bar
+    report = on_progress or (lambda stage, fraction: None)
+
+    report("loading transcript", 0.0)
+    split_docs = load_transcript_chunks(video_url)
+
+    # Embed in batches so progress can be reported, then build the vector store from the vectors
+    texts = [doc.page_content for doc in split_docs]
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        report(f"embedding chunks {start + 1}-{min(start + EMBED_BATCH_SIZE, len(texts))} of {len(texts)}",
+               0.1 + 0.9 * start / len(texts))
+        vectors.extend(embeddings.embed_documents(texts[start:start + EMBED_BATCH_SIZE]))
+    vector_store = FAISS.from_embeddings(
+        list(zip(texts, vectors)), embeddings, metadatas=[doc.metadata for doc in split_docs]
+    )
+
+    report("done", 1.0)
+    return vector_store
 
-    # Create a vector store from the split documents
-    vector_store = FAISS.from_documents(split_docs, embeddings)
+def normalize_video_id(video_url):
+    """The 11-character video ID for any YouTube URL form (watch, youtu.be, shorts, ...) or a bare ID."""
+    video_url = video_url.strip()
+    if len(video_url) == 11 and "/" not in video_url and "." not in video_url:
+        return video_url
+    return YoutubeLoader.extract_video_id(video_url)  # raises ValueError for non-YouTube URLs
 
+
+def _index_cache_root():
+    # Indexes built with another embedding model are not interchangeable
+    return os.path.join(INDEX_CACHE_DIR, embeddings.model)
+
+
+def _evict_old_indexes(keep):
+    root = _index_cache_root()
+    entries = [os.path.join(root, name) for name in os.listdir(root) if not name.startswith(".")]
+    entries.sort(key=os.path.getmtime, reverse=True)  # most recently used first
+    for path in entries[INDEX_CACHE_MAX_VIDEOS:]:
+        if os.path.basename(path) != keep:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def load_or_create_vector_store(video_id, on_progress=None):
+    """FAISS index for a (normalized) video ID: loaded from disk if saved before, else built and saved."""
+    path = os.path.join(_index_cache_root(), video_id)
+    if os.path.isdir(path):
+        os.utime(path)  # mark as recently used for eviction
+        # Only indexes this app saved itself are ever loaded, so unpickling the docstore is safe
+        vector_store = FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+        if on_progress:
+            on_progress("loaded from cache", 1.0)
+        return vector_store
+
+    vector_store = create_vector_store_from_youtube(
+        f"https://www.youtube.com/watch?v={video_id}", on_progress=on_progress
+    )
+    # Save under a temporary name and rename, so a crash never leaves a half-written index behind
+    tmp_path = os.path.join(_index_cache_root(), f".{video_id}.{uuid.uuid4().hex}")
+    vector_store.save_local(tmp_path)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:  # another session saved the same video first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    _evict_old_indexes(keep=video_id)
     return vector_store
 
+
+# Define prompt (built once; only the inputs change per question)
+prompt = PromptTemplate(
+    input_variables=["question", "docs"],
+    template="""
+    You are a helpful assistant that can answer questions about YouTube videos 
+    based on the video's transcript.
+    
+    Answer the following question: {question}
+    By searching the following video transcript: {docs}
+    
+    Only use factual information from the transcript.
+    
+    If you feel like you don't have enough information to answer the question, say "I don't know".
+    
+    Your answers should be verbose and detailed.
+    """,
+)
+
+# Combine prompt → LLM into one runnable
+runnable_sequence = prompt | llm
+
 def get_response_for_query(query, vector_store, k):
     # Retrieve top-k docs
     docs = vector_store.similarity_search(query, k=k)
-    docs_text = "\n".join([doc.page_content for doc in docs])
-
-    # Define prompt
-    prompt = PromptTemplate(
-        input_variables=["question", "docs"],
-        template="""
-        You are a helpful assistant that can answer questions about YouTube videos 
-        based on the video's transcript.
-        
-        Answer the following question: {question}
-        By searching the following video transcript: {docs}
-        
-        Only use factual information from the transcript.
-        
-        If you feel like you don't have enough information to answer the question, say "I don't know".
-        
-        Your answers should be verbose and detailed.
-        """,
-    )
+    return get_response_for_docs(query, docs)
 
-    # Combine prompt → LLM into one runnable
-    runnable_sequence = prompt | llm
+def get_response_for_docs(query, docs):
+    docs_text = "\n".join([doc.page_content for doc in docs])
 
     # Run it
     response = runnable_sequence.invoke({
@@ -59,3 +142,45 @@ def get_response_for_query(query, vector_store, k):
     })
 
     return response.content.strip()  # .content for ChatOpenAI outputs
+
+def get_responses_for_queries(queries, vector_store, k, max_concurrency=LLM_MAX_CONCURRENCY):
+    """Answer many questions about one video; answers come back in the order of `queries`.
+
+    All questions are embedded in one request and searched with a single
+    FAISS call over the whole query matrix; the LLM calls then run with at
+    most `max_concurrency` in flight.
+    """
+    queries = list(queries)
+    if not queries:
+        return []
+    query_matrix = np.asarray(embeddings.embed_documents(queries), dtype=np.float32)
+    if vector_store._normalize_L2:  # same preprocessing as FAISS.similarity_search
+        query_matrix /= np.maximum(np.linalg.norm(query_matrix, axis=1, keepdims=True), 1e-12)
+    _, rows = vector_store.index.search(query_matrix, k)
+
+    inputs = []
+    for query, query_rows in zip(queries, rows):
+        docs = [vector_store.docstore.search(vector_store.index_to_docstore_id[int(row)])
+                for row in query_rows if row != -1]  # -1: fewer than k chunks in the index
+        inputs.append({"question": query, "docs": "\n".join(doc.page_content for doc in docs)})
+
+    responses = runnable_sequence.batch(inputs, config={"max_concurrency": max_concurrency})
+    return [response.content.strip() for response in responses]
+
+def stream_response_for_query(query, vector_store, k, timings=None):
+    """Yield the answer token by token as the LLM produces it.
+
+    If a `timings` dict is given it is filled with retrieval_s, ttft_s (time to
+    first token, from the start of the call) and total_s, in seconds.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    docs = vector_store.similarity_search(query, k=k)
+    docs_text = "\n".join([doc.page_content for doc in docs])
+    timings["retrieval_s"] = round(time.perf_counter() - start, 3)
+
+    for chunk in runnable_sequence.stream({"question": query, "docs": docs_text}):
+        if chunk.content:
+            timings.setdefault("ttft_s", round(time.perf_counter() - start, 3))
+            yield chunk.content
+    timings["total_s"] = round(time.perf_counter() - start, 3)
@@ -1,20 +1,114 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-from lang_index_own_data_agent import create_vector_store_from_youtube, get_response_for_query
+from lang_index_own_data_agent import normalize_video_id, load_or_create_vector_store, stream_response_for_query
+
+
+class IndexingJobs:
+    """Background indexing shared by all sessions: at most one job per video, finished indexes kept in memory."""
+
+    def __init__(self, max_workers=2, max_videos=8):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="youtube-index")
+        self._lock = threading.Lock()
+        self.max_videos = max_videos
+        self.futures = OrderedDict()  # video id -> Future of its FAISS index, least recently used first
+        self.progress = {}  # video id -> (stage, fraction), written by the worker threads
+
+    def _report(self, video_id):
+        return lambda stage, fraction: self.progress.__setitem__(video_id, (stage, fraction))
+
+    def submit(self, video_id, retry_failed=False):
+        """Future for the video's index; starts a job unless one is running, succeeded or (unless
+        `retry_failed`) failed."""
+        with self._lock:
+            future = self.futures.get(video_id)
+            if future is None or (retry_failed and future.done() and future.exception() is not None):
+                self.progress[video_id] = ("queued", 0.0)
+                future = self._pool.submit(load_or_create_vector_store, video_id, self._report(video_id))
+                self.futures[video_id] = future
+            self.futures.move_to_end(video_id)
+            for old_id in list(self.futures)[:-self.max_videos]:
+                if self.futures[old_id].done():  # never drop a job that is still running
+                    del self.futures[old_id]
+                    self.progress.pop(old_id, None)
+            return future
+
+
+@st.cache_resource
+def get_indexing_jobs():
+    # One instance per server process: survives reruns and is shared by all sessions
+    return IndexingJobs()
+
+
+jobs = get_indexing_jobs()
+
+
+def show_indexing_status(future):
+    if future.exception() is not None:
+        st.error(f"Indexing failed: {future.exception()}")
+    else:
+        st.success("Video indexed, ready for questions.")
+
+
+@st.fragment(run_every=1)
+def show_indexing_progress(video_id, future):
+    # Only rendered while the job runs; when it finishes, rerun the whole page so the
+    # status is shown by show_indexing_status() and this fragment stops polling
+    if future.done():
+        st.rerun()
+    stage, fraction = jobs.progress.get(video_id, ("queued", 0.0))
+    st.progress(fraction, text=f"Indexing video: {stage}")
+
+
+def show_timings(timings):
+    st.caption(f"Retrieval {timings.get('retrieval_s', 0):.2f}s · first token {timings.get('ttft_s', 0):.2f}s · "
+               f"total {timings.get('total_s', 0):.2f}s")
+
 
 st.title("YouTube Video Query Assistant")
 
 video_url = st.text_input("Enter the YouTube video URL:")
+try:
+    video_id = normalize_video_id(video_url) if video_url.strip() else None
+except ValueError:
+    video_id = None
+    st.error("Please enter a valid YouTube video URL.")
+
+if video_id:
+    # Start indexing right away, while the user is still typing the question
+    future = jobs.submit(video_id)
+    if future.done():
+        show_indexing_status(future)
+    else:
+        show_indexing_progress(video_id, future)
+
 query = st.text_input("Enter your query about the YouTube video:")
 if st.button("Get Response"):
-    if query:
-        # Create a vector store from the YouTube video
-        vector_store = create_vector_store_from_youtube(video_url)
-        
-        # Get response for the query
-        response = get_response_for_query(query, vector_store, k=5)
-        st.write(f"🔍 **Response:** {response}")
+    if not video_id:
+        st.error("Please enter a valid YouTube video URL.")
+    elif query:
+        # Waits for the background job (or reuses its result) instead of indexing again
+        with st.spinner("Waiting for the video to finish indexing..."):
+            try:
+                vector_store = jobs.submit(video_id, retry_failed=True).result()
+            except Exception as e:
+                st.error(f"Indexing failed: {e}")
+                st.stop()
+
+        # Stream the response for the query as it is generated
+        st.write("🔍 **Response:**")
+        timings = {}
+        answer = st.write_stream(stream_response_for_query(query, vector_store, k=5, timings=timings))
+        show_timings(timings)
+        # Kept for later reruns (e.g. the one the progress fragment triggers when indexing finishes)
+        st.session_state.last_answer = (video_id, query, answer, timings)
     else:
         st.error("Please enter a query.")
+elif st.session_state.get("last_answer", (None, None))[:2] == (video_id, query):
+    _, _, answer, timings = st.session_state.last_answer
+    st.write("🔍 **Response:**")
+    st.write(answer)
+    show_timings(timings)
 else:
     st.write("Enter your query and click the button to get a response.")
-